@@ -0,0 +1,70 @@
+"""Benchmark caption overlay rendering: ``ImageDraw.text`` vs the glyph atlas.
+
+Renders the same caption set through ``render_caption_png`` with
+``text_renderer="pil"`` and ``text_renderer="atlas"`` at each size preset and
+reports captions per second. The atlas is warmed by one pass first, which is
+the steady state of a long-running worker.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_caption_atlas
+"""
+
+import os
+import random
+import time
+
+from src.core.config import settings
+from src.lib.captioning.layout import (
+    PRESET_FONT_SIZES,
+    compute_layout,
+    render_caption_png,
+    wrap_and_autoscale_text,
+)
+
+CAPTIONS = 50
+WORDS = (
+    "i finally stopped waiting for motivation and started showing up every "
+    "single morning even when nobody was watching"
+).split()
+
+
+def _render_all(layouts, box, renderer):
+    start = time.perf_counter()
+    for caption_layout in layouts:
+        path = render_caption_png(
+            caption_layout,
+            settings.font_path,
+            box,
+            stroke_width_px=5,
+            background=None,
+            text_renderer=renderer,
+        )
+        os.unlink(path)
+    return len(layouts) / (time.perf_counter() - start)
+
+
+def main():
+    rng = random.Random(0)
+    box = compute_layout((1080, 1920), "center", 0.06)["caption_box"]
+    captions = [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24)))
+        for _ in range(CAPTIONS)
+    ]
+
+    print(f"{'preset':>7} {'pil/s':>8} {'atlas/s':>8} {'speedup':>8}")
+    for preset in PRESET_FONT_SIZES:
+        layouts = [
+            wrap_and_autoscale_text(
+                caption, settings.font_path, box["w"], box["h"], size_preset=preset
+            )
+            for caption in captions
+        ]
+        _render_all(layouts, box, "atlas")  # warm the atlas
+        pil = _render_all(layouts, box, "pil")
+        atlas = _render_all(layouts, box, "atlas")
+        print(f"{preset:>7} {pil:>8.1f} {atlas:>8.1f} {atlas / pil:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
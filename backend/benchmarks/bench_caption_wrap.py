@@ -0,0 +1,106 @@
+"""Microbenchmark for caption wrapping in ``src.lib.captioning.layout``.
+
+Sweeps caption length and times the previous ``getbbox``-per-candidate
+wrapper against ``_wrap_text_to_width`` over every font size the autoscaler
+may try (preset size down to ``min_px``), checking both produce the same lines.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_caption_wrap
+"""
+
+import random
+import time
+from typing import List
+
+from PIL import ImageFont
+
+from src.core.config import settings
+from src.lib.captioning.layout import (
+    PRESET_FONT_SIZES,
+    _load_font,
+    _wrap_text_to_width,
+)
+
+BOX_W = 1080 - 2 * 115
+SIZES = range(PRESET_FONT_SIZES["medium"], 9, -1)
+LENGTHS = (5, 10, 20, 40, 80, 160)
+WORDS = (
+    "i finally stopped waiting for motivation and started showing up every "
+    "single morning even when nobody was watching supercalifragilistic"
+).split()
+
+
+def _legacy_wrap(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> List[str]:
+    def measure(text_value: str) -> int:
+        bbox = font.getbbox(text_value if text_value else " ")
+        return bbox[2] - bbox[0]
+
+    def split_word(word: str) -> List[str]:
+        if measure(word) <= max_width or len(word) == 1:
+            return [word]
+        parts: List[str] = []
+        current = ""
+        for ch in word:
+            trial = current + ch
+            if measure(trial) <= max_width or not current:
+                current = trial
+            else:
+                parts.append(current)
+                current = ch
+        if current:
+            parts.append(current)
+        return parts
+
+    lines: List[str] = []
+    for paragraph in text.split("\n"):
+        words = paragraph.split()
+        if not words:
+            lines.append("")
+            continue
+        current = ""
+        for word in words:
+            for seg_index, segment in enumerate(split_word(word)):
+                prefix = " " if (current and seg_index == 0) else ""
+                candidate = current + prefix + segment if current else segment
+                if candidate and measure(candidate) <= max_width:
+                    current = candidate
+                else:
+                    if current:
+                        lines.append(current)
+                    current = segment
+        if current:
+            lines.append(current)
+    return lines
+
+
+def main():
+    rng = random.Random(0)
+    fonts = {size: _load_font(settings.font_path, size) for size in SIZES}
+
+    print(f"{'words':>6} {'legacy ms':>10} {'cold ms':>9} {'warm ms':>9} {'same':>5}")
+    for length in LENGTHS:
+        caption = " ".join(rng.choice(WORDS) for _ in range(length))
+
+        start = time.perf_counter()
+        legacy = [_legacy_wrap(caption, fonts[size], BOX_W) for size in SIZES]
+        legacy_ms = (time.perf_counter() - start) * 1000
+
+        # Cold: fresh font objects, so the word-width cache starts empty
+        cold_fonts = {
+            size: ImageFont.truetype(settings.font_path, size) for size in SIZES
+        }
+        start = time.perf_counter()
+        cold = [_wrap_text_to_width(caption, cold_fonts[size], BOX_W) for size in SIZES]
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        warm = [_wrap_text_to_width(caption, fonts[size], BOX_W) for size in SIZES]
+        warm_ms = (time.perf_counter() - start) * 1000
+
+        same = legacy == cold == warm
+        print(f"{length:>6} {legacy_ms:>10.2f} {cold_ms:>9.2f} {warm_ms:>9.2f} {str(same):>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark carousel captioning: one ffmpeg per slide vs the in-process batch.
+
+Captions a 10-story x 8-slide carousel from synthetic JPEG backgrounds with
+``add_caption_to_image`` (one ffmpeg process per slide, skipped when ffmpeg
+is not on PATH) and with ``add_captions_to_images``, and reports the time
+per slide.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_carousel_batch
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from PIL import Image
+
+from src.core.config import settings
+from src.lib.toolkit import add_caption_to_image, add_captions_to_images
+
+STORIES = 10
+SLIDES = 8
+SOURCE_SIZES = ((1080, 1350), (1440, 1920), (3024, 4032))
+WORDS = (
+    "i finally stopped waiting for motivation and started showing up every "
+    "single morning even when nobody was watching"
+).split()
+
+
+def main():
+    rng = random.Random(0)
+    work_dir = tempfile.mkdtemp(prefix="bench_carousel_")
+    try:
+        sources = []
+        for i, size in enumerate(SOURCE_SIZES):
+            path = os.path.join(work_dir, f"source_{i}.jpg")
+            Image.effect_mandelbrot(size, (-2, -1.5, 1, 1.5), 64).convert("RGB").save(
+                path, quality=90
+            )
+            sources.append(path)
+
+        slides = [
+            (
+                rng.choice(sources),
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16))),
+                os.path.join(work_dir, f"{story:02d}_{slide:02d}.jpeg"),
+            )
+            for story in range(STORIES)
+            for slide in range(SLIDES)
+        ]
+        style = dict(output_size=(1080, 1920), font_path=settings.font_path, background=None)
+
+        print(f"{'mode':>10} {'slides':>7} {'total s':>8} {'ms/slide':>9}")
+        if shutil.which("ffmpeg"):
+            start = time.perf_counter()
+            for source, caption, out_path in slides:
+                add_caption_to_image(source, out_path, caption=caption, **style)
+            elapsed = time.perf_counter() - start
+            print(f"{'ffmpeg':>10} {len(slides):>7} {elapsed:>8.2f} {elapsed / len(slides) * 1000:>9.1f}")
+        else:
+            print(f"{'ffmpeg':>10} {'skipped (ffmpeg not on PATH)':>27}")
+
+        start = time.perf_counter()
+        add_captions_to_images(slides, **style)
+        elapsed = time.perf_counter() - start
+        print(f"{'batch':>10} {len(slides):>7} {elapsed:>8.2f} {elapsed / len(slides) * 1000:>9.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark the named encoding profiles in ``src.lib.captioning.ffmpeg``.
+
+Generates a fixed set of synthetic clips with ffmpeg's ``lavfi`` sources
+(static-ish test pattern, high-motion noise, a landscape clip that gets
+padded), captions each through ``build_ffmpeg_video_cmd`` with every entry of
+``ENCODING_PROFILES``, and reports encode time and output size. Requires
+ffmpeg on PATH.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_encoding_profiles
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from src.core.config import settings
+from src.lib.captioning.ffmpeg import ENCODING_PROFILES, build_ffmpeg_video_cmd
+from src.lib.captioning.layout import (
+    compute_layout,
+    render_caption_png,
+    wrap_and_autoscale_text,
+)
+
+SECONDS = 8
+CLIPS = {
+    "testsrc": f"testsrc2=size=1080x1920:rate=30:duration={SECONDS}",
+    "noise": f"nullsrc=size=1080x1920:rate=30:duration={SECONDS},geq=random(1)*255:128:128",
+    "landscape": f"mandelbrot=size=1920x1080:rate=30,trim=duration={SECONDS}",
+}
+
+
+def _run(cmd):
+    subprocess.run(
+        cmd,
+        check=True,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
+
+
+def main():
+    if not shutil.which("ffmpeg"):
+        sys.exit("ffmpeg not found on PATH")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_profiles_")
+    layout = compute_layout((1080, 1920), "center", 0.06)
+    box = layout["caption_box"]
+    caption_png = render_caption_png(
+        wrap_and_autoscale_text(
+            "i finally stopped waiting for motivation", settings.font_path, box["w"], box["h"]
+        ),
+        settings.font_path,
+        box,
+        stroke_width_px=5,
+        background=None,
+    )
+    try:
+        sources = {}
+        for name, graph in CLIPS.items():
+            path = os.path.join(work_dir, f"{name}.mp4")
+            _run(
+                [
+                    "ffmpeg", "-nostdin", "-y", "-v", "error",
+                    "-f", "lavfi", "-i", graph,
+                    "-f", "lavfi", "-i", f"sine=frequency=440:duration={SECONDS}",
+                    "-c:v", "libx264", "-preset", "ultrafast", "-crf", "12",
+                    "-c:a", "aac", "-shortest", path,
+                ]
+            )
+            sources[name] = path
+
+        print(f"{'clip':>10} {'profile':>8} {'encode s':>9} {'x realtime':>11} {'size KiB':>9} {'kbit/s':>8}")
+        for name, source in sources.items():
+            for profile in ENCODING_PROFILES:
+                out_path = os.path.join(work_dir, f"{name}_{profile}.mp4")
+                cmd = build_ffmpeg_video_cmd(
+                    source,
+                    out_path,
+                    canvas_w=layout["canvas_w"],
+                    canvas_h=layout["canvas_h"],
+                    caption_png=caption_png,
+                    caption_box=box,
+                    profile=profile,
+                )
+                start = time.perf_counter()
+                _run(cmd)
+                elapsed = time.perf_counter() - start
+                size = os.path.getsize(out_path)
+                print(
+                    f"{name:>10} {profile:>8} {elapsed:>9.2f} {SECONDS / elapsed:>10.1f}x "
+                    f"{size / 1024:>9.0f} {size * 8 / SECONDS / 1000:>8.0f}"
+                )
+    finally:
+        os.unlink(caption_png)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
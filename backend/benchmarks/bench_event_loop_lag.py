@@ -0,0 +1,74 @@
+"""Event-loop lag under concurrent publishes: inline Supabase calls vs the pool.
+
+Each simulated publish makes the same round trips as ``_publish_post``: it
+reads the post, reads the account token, awaits the TikTok call and writes
+the result. The three Supabase queries are stand-ins whose ``execute()``
+blocks for ``LATENCY_MS``, as supabase-py's does on the network. A monitor
+task asks to wake every millisecond and records how late it runs.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_event_loop_lag
+"""
+
+import asyncio
+import statistics
+import time
+
+from src.core.supabase import aexecute
+
+PUBLISHES = 50
+LATENCY_MS = 40
+TIKTOK_MS = 150
+TICK_S = 0.001
+
+
+class BlockingQuery:
+    """A query builder whose ``execute()`` blocks like a network round trip."""
+
+    def execute(self):
+        time.sleep(LATENCY_MS / 1000)
+        return None
+
+
+async def inline(query):
+    return query.execute()
+
+
+async def publish(run_query):
+    await run_query(BlockingQuery())  # publishing row
+    await run_query(BlockingQuery())  # tiktok_accounts token
+    await asyncio.sleep(TIKTOK_MS / 1000)  # TikTok publish init
+    await run_query(BlockingQuery())  # result write-back
+
+
+async def measure(run_query):
+    lags = []
+    done = asyncio.Event()
+
+    async def monitor():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_S)
+            lags.append((time.perf_counter() - start - TICK_S) * 1000)
+
+    monitor_task = asyncio.create_task(monitor())
+    start = time.perf_counter()
+    await asyncio.gather(*(publish(run_query) for _ in range(PUBLISHES)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await monitor_task
+    lags.sort()
+    return elapsed, statistics.median(lags), lags[int(len(lags) * 0.99) - 1], lags[-1]
+
+
+def main():
+    print(f"{PUBLISHES} concurrent publishes, {LATENCY_MS} ms per Supabase query")
+    print(f"{'mode':>8} {'total s':>8} {'lag p50':>8} {'lag p99':>8} {'lag max':>8}")
+    for name, run_query in (("inline", inline), ("pool", aexecute)):
+        elapsed, p50, p99, worst = asyncio.run(measure(run_query))
+        print(f"{name:>8} {elapsed:>8.2f} {p50:>7.1f}ms {p99:>7.1f}ms {worst:>7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Benchmark shadow compositing in the high-quality text renderer.
+
+Compares the previous per-line shadow (full-canvas layer, blur and composite
+for every line) against ``_composite_text_shadow`` for 1 to 10 line captions.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_hq_shadow
+"""
+
+import time
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from src.content.hq_text_renderer import _composite_text_shadow
+from src.core.config import settings
+
+SCALE = 2
+FONT_SIZE = 50 * SCALE
+LINE_HEIGHT = int(FONT_SIZE * 1.2)
+OFFSET = (2 * SCALE, 2 * SCALE)
+BLUR = 1 * SCALE
+ROUNDS = 20
+LINE = "This is one caption line"
+
+
+def _placements(font, num_lines, canvas_width, padding):
+    placements = []
+    for i in range(num_lines):
+        bbox = font.getbbox(LINE)
+        x = (canvas_width - (bbox[2] - bbox[0])) // 2
+        placements.append((LINE, x, padding + i * LINE_HEIGHT, bbox))
+    return placements
+
+
+def _legacy_shadow(img, font, placements):
+    for line, x, y, _ in placements:
+        shadow_img = Image.new("RGBA", img.size, (0, 0, 0, 0))
+        ImageDraw.Draw(shadow_img).text(
+            (x + OFFSET[0], y + OFFSET[1]), line, font=font, fill=(0, 0, 0)
+        )
+        shadow_img = shadow_img.filter(ImageFilter.GaussianBlur(BLUR))
+        img = Image.alpha_composite(img, shadow_img)
+    return img
+
+
+def _time(fn):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    font = ImageFont.truetype(settings.font_path, FONT_SIZE)
+    padding = 10 * SCALE
+    canvas_width = font.getbbox(LINE)[2] + padding * 2
+
+    print(f"{'lines':>5} {'legacy ms':>10} {'single ms':>10} {'speedup':>8}")
+    for num_lines in range(1, 11):
+        size = (canvas_width, num_lines * LINE_HEIGHT + padding * 2)
+        placements = _placements(font, num_lines, canvas_width, padding)
+
+        legacy = _time(
+            lambda: _legacy_shadow(
+                Image.new("RGBA", size, (0, 0, 0, 0)), font, placements
+            )
+        )
+        single = _time(
+            lambda: _composite_text_shadow(
+                Image.new("RGBA", size, (0, 0, 0, 0)),
+                font,
+                placements,
+                (0, 0, 0),
+                OFFSET,
+                BLUR,
+            )
+        )
+        print(f"{num_lines:>5} {legacy:>10.2f} {single:>10.2f} {legacy / single:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
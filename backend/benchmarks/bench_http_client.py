@@ -0,0 +1,63 @@
+"""Per-call latency to the TikTok API: a new client per call vs the shared client.
+
+Sends sequential unauthenticated POSTs to the token endpoint. TikTok answers
+them with an error, which is fine here: only the round trip is measured.
+A fresh ``httpx.AsyncClient`` per call (the old pattern) pays DNS, TCP and
+TLS every time. The shared client from ``src.core.http`` reuses pooled
+connections, over HTTP/2 when ``h2`` is installed.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_http_client [url]
+"""
+
+import asyncio
+import logging
+import statistics
+import sys
+import time
+
+import httpx
+
+from src.core.http import close_http_client, get_http_client
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+CALLS = 20
+URL = "https://open.tiktokapis.com/v2/oauth/token/"
+
+
+async def fresh_client_call(url):
+    async with httpx.AsyncClient(timeout=30) as client:
+        return await client.post(url, data={})
+
+
+async def shared_client_call(url):
+    return await get_http_client().post(url, data={})
+
+
+async def measure(call, url):
+    timings = []
+    for _ in range(CALLS):
+        start = time.perf_counter()
+        response = await call(url)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, response.http_version
+
+
+async def main(url):
+    print(f"{CALLS} sequential POSTs to {url}")
+    print(f"{'client':>8} {'version':>9} {'first ms':>9} {'p50 ms':>8} {'mean ms':>8}")
+    try:
+        for name, call in (("fresh", fresh_client_call), ("shared", shared_client_call)):
+            timings, version = await measure(call, url)
+            print(
+                f"{name:>8} {version:>9} {timings[0]:>9.1f} "
+                f"{statistics.median(timings):>8.1f} {statistics.mean(timings):>8.1f}"
+            )
+    finally:
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else URL))
@@ -0,0 +1,128 @@
+"""Size/SSIM report for carousel slide output formats.
+
+Composes captioned 1080x1920 slides the way ``add_captions_to_images`` does,
+then encodes each one with the previous Pillow settings (quality 90, no
+other tuning) and with every entry of ``IMAGE_SAVE_OPTIONS``. It reports
+the mean file size, the mean encode time and the mean SSIM (luma, 8x8
+windows) against the lossless slide.
+
+Pass a directory of background images to use real sources; otherwise a few
+synthetic backgrounds are generated.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_slide_formats [backgrounds_dir]
+"""
+
+import io
+import os
+import random
+import sys
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from src.core.config import settings
+from src.lib.captioning.layout import (
+    compute_layout,
+    render_caption_image,
+    wrap_and_autoscale_text,
+)
+from src.lib.toolkit import IMAGE_SAVE_OPTIONS, _load_image_fitted
+
+SLIDES = 12
+WORDS = (
+    "i finally stopped waiting for motivation and started showing up every "
+    "single morning even when nobody was watching"
+).split()
+FORMATS = {"jpeg q90 (previous)": {"format": "JPEG", "quality": 90}, **IMAGE_SAVE_OPTIONS}
+
+
+def _synthetic_backgrounds(rng):
+    noise = Image.effect_noise((1080, 1920), 64).convert("RGB")
+    photo_like = Image.merge(
+        "RGB",
+        [
+            Image.effect_noise((270, 480), 90).filter(ImageFilter.GaussianBlur(6)),
+            Image.linear_gradient("L").resize((270, 480)),
+            Image.effect_noise((270, 480), 40).filter(ImageFilter.GaussianBlur(2)),
+        ],
+    ).resize((1080, 1920), Image.Resampling.BICUBIC)
+    fractal = Image.effect_mandelbrot((1080, 1920), (-2, -1.5, 1, 1.5), 96).convert("RGB")
+    return [photo_like, fractal, noise]
+
+
+def _box_mean(a, size=8):
+    c = np.cumsum(np.cumsum(np.pad(a, ((1, 0), (1, 0))), axis=0), axis=1)
+    return (c[size:, size:] - c[:-size, size:] - c[size:, :-size] + c[:-size, :-size]) / (
+        size * size
+    )
+
+
+def _ssim(a, b):
+    x = np.asarray(a.convert("L"), dtype=np.float64)
+    y = np.asarray(b.convert("L"), dtype=np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mx, my = _box_mean(x), _box_mean(y)
+    vx = _box_mean(x * x) - mx * mx
+    vy = _box_mean(y * y) - my * my
+    cov = _box_mean(x * y) - mx * my
+    ssim = ((2 * mx * my + c1) * (2 * cov + c2)) / ((mx * mx + my * my + c1) * (vx + vy + c2))
+    return float(ssim.mean())
+
+
+def main():
+    rng = random.Random(0)
+    if len(sys.argv) > 1:
+        directory = sys.argv[1]
+        names = sorted(
+            name
+            for name in os.listdir(directory)
+            if name.lower().endswith((".jpg", ".jpeg", ".png", ".webp"))
+        )
+        backgrounds = [
+            _load_image_fitted(os.path.join(directory, name), (1080, 1920))
+            for name in names[:SLIDES]
+        ]
+    else:
+        backgrounds = _synthetic_backgrounds(rng)
+
+    layout = compute_layout((1080, 1920), "center", 0.06)
+    box = layout["caption_box"]
+    slides = []
+    for i in range(SLIDES):
+        caption = " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 16)))
+        overlay = render_caption_image(
+            wrap_and_autoscale_text(caption, settings.font_path, box["w"], box["h"]),
+            settings.font_path,
+            box,
+            stroke_width_px=5,
+            background=None,
+        )
+        slide = backgrounds[i % len(backgrounds)].copy()
+        slide.paste(overlay, (box["x"], box["y"]), overlay)
+        slides.append(slide)
+
+    print(f"{'format':>20} {'mean KiB':>9} {'vs prev':>8} {'encode ms':>10} {'SSIM':>7}")
+    baseline = None
+    for name, options in FORMATS.items():
+        sizes, times, scores = [], [], []
+        for slide in slides:
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            slide.save(buffer, **options)
+            times.append(time.perf_counter() - start)
+            sizes.append(buffer.tell())
+            buffer.seek(0)
+            scores.append(_ssim(slide, Image.open(buffer)))
+        mean_size = sum(sizes) / len(sizes)
+        baseline = baseline or mean_size
+        print(
+            f"{name:>20} {mean_size / 1024:>9.1f} {mean_size / baseline:>7.2f}x "
+            f"{sum(times) / len(times) * 1000:>10.1f} {sum(scores) / len(scores):>7.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
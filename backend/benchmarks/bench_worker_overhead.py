@@ -0,0 +1,66 @@
+"""Per-job fixed overhead of the RQ worker variants.
+
+Enqueues the same small caption-render job repeatedly and runs it through
+plain ``rq.Worker`` (fork per job from a cold parent), ``WarmForkWorker``
+and ``WarmSimpleWorker`` in burst mode, reporting wall time per job. Needs
+a Redis server at ``REDIS_URL``; the benchmark uses its own queue.
+
+Run from ``backend/``::
+
+    python -m benchmarks.bench_worker_overhead
+"""
+
+import os
+import sys
+import time
+
+from redis import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rq import Queue, Worker
+
+from src.core.config import settings
+
+JOBS = 20
+
+
+def caption_job(caption):
+    """A small render job: wraps and rasterizes one caption overlay."""
+
+    from src.lib.toolkit import compute_layout, render_caption_png, wrap_and_autoscale_text
+
+    box = compute_layout((1080, 1920), "center", 0.06)["caption_box"]
+    layout = wrap_and_autoscale_text(caption, settings.font_path, box["w"], box["h"])
+    os.unlink(render_caption_png(layout, settings.font_path, box, background=None))
+
+
+def _run(worker_class, connection, **kwargs):
+    queue = Queue("bench-overhead", connection=connection)
+    queue.empty()
+    for i in range(JOBS):
+        queue.enqueue("benchmarks.bench_worker_overhead.caption_job", f"caption number {i}")
+    worker = worker_class([queue], connection=connection, **kwargs)
+    start = time.perf_counter()
+    worker.work(burst=True, logging_level="WARNING")
+    return (time.perf_counter() - start) / JOBS * 1000
+
+
+def main():
+    connection = Redis.from_url(settings.redis_url)
+    try:
+        connection.ping()
+    except RedisConnectionError:
+        sys.exit(f"no Redis at {settings.redis_url}")
+
+    print(f"{'worker':>18} {'ms/job':>8}")
+    # Before anything is warmed in this process, so the work horses start cold
+    print(f"{'rq.Worker (cold)':>18} {_run(Worker, connection):>8.1f}")
+
+    from src.jobs.worker import WarmForkWorker, WarmSimpleWorker, warm_up
+
+    print(f"{'warm-up':>18} {warm_up() * 1000:>8.1f} (once)")
+    print(f"{'WarmForkWorker':>18} {_run(WarmForkWorker, connection):>8.1f}")
+    print(f"{'WarmSimpleWorker':>18} {_run(WarmSimpleWorker, connection):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
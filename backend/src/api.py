@@ -6,7 +6,8 @@ from rq.job import Job, NoSuchJobError
 
 from supabase import Client
 from src.core.supabase import supabase_dependency
-from src.core.redis import redis_dependency
+from src.core.redis import queue_depths, redis_dependency
+from src.jobs.fairshare import pending_summary, waiting_position
 from src.workflow.router import router as workflow_router
 from src.auth.router import router as auth_router
 from src.publishing.router import router as publishing_router
@@ -23,6 +24,7 @@ api_router = APIRouter(
         401: {"model": ErrorResponse},
         403: {"model": ErrorResponse},
         404: {"model": ErrorResponse},
+        429: {"model": ErrorResponse},
         500: {"model": ErrorResponse},
     },
 )
@@ -45,6 +47,16 @@ def healthcheck():
     return {"status": "ok"}
 
 
+@api_router.get("/jobs")
+def jobs_overview(redis: Redis = Depends(redis_dependency)):
+    """Per-queue job counts, including jobs held back by fair-share dispatch."""
+    depths = queue_depths(redis)
+    for name, pending in pending_summary(redis).items():
+        depths[name]["waiting_users"] = pending["users"]
+        depths[name]["waiting"] = pending["pending"]
+    return {"queues": depths}
+
+
 @api_router.get("/jobs/{job_id}")
 def job_status(
     job_id: str,
@@ -57,6 +69,7 @@ def job_status(
         return {
             "id": job.id,
             "status": job.get_status(),
+            "position": waiting_position(redis, job),
             "result": job.result if job.is_finished else None,
             "error": job.exc_info if job.is_failed else None,
         }
@@ -23,7 +23,7 @@ router = APIRouter()
 
 @router.get("/tiktok/start")
 async def tiktok_start(user=Depends(get_user), supabase=Depends(supabase_dependency)):
-    payload = create_authorize_payload(user["sub"], supabase)
+    payload = await create_authorize_payload(user["sub"], supabase)
     return JSONResponse(payload)
 
 
@@ -37,7 +37,7 @@ async def tiktok_callback(code: str, state: str, supabase=Depends(supabase_depen
 async def tiktok_accounts(
     user=Depends(get_user), supabase=Depends(supabase_dependency)
 ):
-    return {"accounts": list_accounts(supabase, user["sub"])}
+    return {"accounts": await list_accounts(supabase, user["sub"])}
 
 
 @router.get("/tiktok/profile")
@@ -75,7 +75,7 @@ async def tiktok_post(
 async def tiktok_unlink(
     open_id: str, user=Depends(get_user), supabase=Depends(supabase_dependency)
 ):
-    return unlink_account(supabase, user["sub"], open_id)
+    return await unlink_account(supabase, user["sub"], open_id)
 
 
 @router.post("/tiktok/relink")
@@ -84,5 +84,5 @@ async def tiktok_relink(
     user=Depends(get_user),
     supabase=Depends(supabase_dependency),
 ):
-    payload = create_relink_payload(supabase, user["sub"], body)
+    payload = await create_relink_payload(supabase, user["sub"], body)
     return JSONResponse(payload)
@@ -5,6 +5,7 @@ from __future__ import annotations
 import asyncio
 import logging
 import os
+import time
 from collections import defaultdict
 from datetime import timedelta
 from typing import Any, Dict, Iterable, List, Optional, Tuple
@@ -12,7 +13,10 @@ from typing import Any, Dict, Iterable, List, Optional, Tuple
 import httpx
 from fastapi import FastAPI, HTTPException
 
+from src.auth import token_cache
 from src.auth.models import PostRequest, RelinkRequest
+from src.core.http import get_http_client
+from src.core.supabase import aexecute
 from src.auth.utils import (
     analytics_row_sort_key,
     coerce_number,
@@ -43,6 +47,7 @@ REFRESH_MARGIN_SECONDS = int(os.getenv("TIKTOK_TOKEN_REFRESH_MARGIN_SECONDS", "2
 REFRESH_INTERVAL_SECONDS = int(
     os.getenv("TIKTOK_TOKEN_REFRESH_INTERVAL_SECONDS", "3600")
 )
+REFRESH_CONCURRENCY = int(os.getenv("TIKTOK_TOKEN_REFRESH_CONCURRENCY", "16"))
 
 _METRIC_FIELD_ALIASES: Dict[str, Tuple[str, type]] = {
     "view_count": ("views", int),
@@ -84,14 +89,13 @@ _TIMESERIES_METRICS = _AGGREGATABLE_METRICS | {
 _ENGAGEMENT_COMPONENTS = ("likes", "comments", "shares", "favorites")
 
 
-def get_account_row(supabase, user_id: str, open_id: str) -> Dict[str, Any]:
-    res = (
+async def get_account_row(supabase, user_id: str, open_id: str) -> Dict[str, Any]:
+    res = await aexecute(
         supabase.table("tiktok_accounts")
         .select("*")
         .eq("user_id", user_id)
         .eq("open_id", open_id)
         .limit(1)
-        .execute()
     )
     rows = res.data or []
     if not rows:
@@ -260,7 +264,7 @@ async def _get_analytics(
         raise HTTPException(400, "open_id is required")
 
     # Ensure the account exists and get current tokens
-    account = get_account_row(supabase, user_id, open_id)
+    account = await get_account_row(supabase, user_id, open_id)
 
     # Acquire a fresh access token using the existing helper
     try:
@@ -285,15 +289,14 @@ async def _get_analytics(
         }
     }
 
-    with httpx.Client(timeout=30) as client:
-        r = client.post(
-            f"{VIDEO_QUERY}?{query_params}",
-            json=body,
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json; charset=UTF-8",
-            },
-        )
+    r = await get_http_client().post(
+        f"{VIDEO_QUERY}?{query_params}",
+        json=body,
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=UTF-8",
+        },
+    )
 
     if r.status_code != 200:
         # bubble upstream error body for easier debugging
@@ -379,11 +382,13 @@ async def get_publish_analytics(supabase, user_id: str, publish_id: str, open_id
     return await _get_analytics(supabase, user_id, publish_id, open_id)
 
 
-def create_authorize_payload(state: str, supabase) -> Dict[str, Any]:
+async def create_authorize_payload(state: str, supabase) -> Dict[str, Any]:
     verifier, challenge = pkce_pair()
-    supabase.table("tiktok_pkce_states").upsert(
-        {"state": state, "user_id": state, "code_verifier": verifier}
-    ).execute()
+    await aexecute(
+        supabase.table("tiktok_pkce_states").upsert(
+            {"state": state, "user_id": state, "code_verifier": verifier}
+        )
+    )
     qs = httpx.QueryParams(
         {
             "client_key": CLIENT_KEY,
@@ -398,12 +403,11 @@ def create_authorize_payload(state: str, supabase) -> Dict[str, Any]:
     return {"authorize_url": f"{AUTH_URL}?{qs}"}
 
 
-def list_accounts(supabase, user_id: str) -> List[Dict[str, Any]]:
-    res = (
+async def list_accounts(supabase, user_id: str) -> List[Dict[str, Any]]:
+    res = await aexecute(
         supabase.table("tiktok_accounts")
         .select("open_id,scope,expires_at")
         .eq("user_id", user_id)
-        .execute()
     )
     return res.data or []
 
@@ -412,27 +416,33 @@ async def complete_callback(
     supabase, *, code: str, state: str
 ) -> Tuple[Dict[str, Any], int]:
     rec = (
-        supabase.table("tiktok_pkce_states")
-        .select("code_verifier,expires_at")
-        .eq("state", state)
-        .eq("user_id", state)
-        .single()
-        .execute()
-        .data
-    )
+        await aexecute(
+            supabase.table("tiktok_pkce_states")
+            .select("code_verifier,expires_at")
+            .eq("state", state)
+            .eq("user_id", state)
+            .single()
+        )
+    ).data
     if not rec:
         return {"error": "invalid/expired state"}, 400
 
     if parse_ts(rec["expires_at"]) <= utcnow():
-        supabase.table("tiktok_pkce_states").delete().eq("state", state).eq(
-            "user_id", state
-        ).execute()
+        await aexecute(
+            supabase.table("tiktok_pkce_states")
+            .delete()
+            .eq("state", state)
+            .eq("user_id", state)
+        )
         return {"error": "invalid/expired state"}, 400
 
     code_verifier = rec["code_verifier"]
-    supabase.table("tiktok_pkce_states").delete().eq("state", state).eq(
-        "user_id", state
-    ).execute()
+    await aexecute(
+        supabase.table("tiktok_pkce_states")
+        .delete()
+        .eq("state", state)
+        .eq("user_id", state)
+    )
 
     data = {
         "client_key": CLIENT_KEY,
@@ -443,12 +453,11 @@ async def complete_callback(
         "code_verifier": code_verifier,
     }
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
-            TOKEN_URL,
-            data=data,
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
+    resp = await get_http_client().post(
+        TOKEN_URL,
+        data=data,
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
 
     if resp.status_code != 200:
         return resp.json(), resp.status_code
@@ -461,10 +470,15 @@ async def complete_callback(
         **_token_update_fields(tok),
     }
 
-    supabase.table("tiktok_accounts").upsert(
-        updates,
-        on_conflict="user_id,open_id",
-    ).execute()
+    await aexecute(
+        supabase.table("tiktok_accounts").upsert(
+            updates,
+            on_conflict="user_id,open_id",
+        )
+    )
+    await token_cache.store(
+        state, tok["open_id"], updates["access_token"], parse_ts(updates["expires_at"])
+    )
 
     return {"linked": True, "open_id": tok["open_id"], "scope": tok.get("scope")}, 200
 
@@ -490,26 +504,17 @@ def _token_update_fields(
     return updates
 
 
-async def _request_token_refresh(
-    refresh_token: str, client: Optional[httpx.AsyncClient] = None
-) -> Dict[str, Any]:
-    owns_client = client is None
-    if owns_client:
-        client = httpx.AsyncClient(timeout=30)
-    try:
-        response = await client.post(
-            TOKEN_URL,
-            data={
-                "client_key": CLIENT_KEY,
-                "client_secret": CLIENT_SECRET,
-                "grant_type": "refresh_token",
-                "refresh_token": refresh_token,
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-        )
-    finally:
-        if owns_client:
-            await client.aclose()
+async def _request_token_refresh(refresh_token: str) -> Dict[str, Any]:
+    response = await get_http_client().post(
+        TOKEN_URL,
+        data={
+            "client_key": CLIENT_KEY,
+            "client_secret": CLIENT_SECRET,
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
 
     if response.status_code != 200:
         raise HTTPException(response.status_code, response.text)
@@ -518,54 +523,74 @@ async def _request_token_refresh(
 
 
 async def ensure_fresh_access(supabase, user_id: str, open_id: str) -> str:
+    token = token_cache.get_cached(user_id, open_id)
+    if token:
+        return token
+    token = await token_cache.get_shared(user_id, open_id)
+    if token:
+        return token
+
     logger.debug(
         "Ensuring fresh access token", extra={"user_id": user_id, "open_id": open_id}
     )
-    record = get_account_row(supabase, user_id, open_id)
-    expires_at = parse_ts(record["expires_at"])
-    if expires_at > utcnow() + timedelta(seconds=60):
-        return record["access_token"]
-
-    payload = await _request_token_refresh(record["refresh_token"])
-    updates = _token_update_fields(payload, fallback_refresh=record["refresh_token"])
-
-    supabase.table("tiktok_accounts").update(updates).eq("user_id", user_id).eq(
-        "open_id", open_id
-    ).execute()
+    async with token_cache.refresh_lock(user_id, open_id):
+        # Whoever held the lock before us may have refreshed already
+        token = token_cache.get_cached(user_id, open_id)
+        if token:
+            return token
+
+        record = await get_account_row(supabase, user_id, open_id)
+        expires_at = parse_ts(record["expires_at"])
+        if token_cache.is_fresh(expires_at):
+            await token_cache.store(user_id, open_id, record["access_token"], expires_at)
+            return record["access_token"]
+
+        payload = await _request_token_refresh(record["refresh_token"])
+        updates = _token_update_fields(payload, fallback_refresh=record["refresh_token"])
+
+        await aexecute(
+            supabase.table("tiktok_accounts")
+            .update(updates)
+            .eq("user_id", user_id)
+            .eq("open_id", open_id)
+        )
+        await token_cache.store(
+            user_id, open_id, updates["access_token"], parse_ts(updates["expires_at"])
+        )
 
     return updates["access_token"]
 
 
-async def refresh_due_accounts(supabase) -> None:
-    threshold = (utcnow() + timedelta(seconds=REFRESH_MARGIN_SECONDS)).isoformat()
-    accounts = (
-        supabase.table("tiktok_accounts")
-        .select("user_id,open_id,refresh_token,refresh_expires_at,expires_at")
-        .lte("expires_at", threshold)
-        .execute()
-        .data
-        or []
-    )
-    if not accounts:
-        return
+async def _refresh_account(
+    supabase, account: Dict[str, Any], semaphore: asyncio.Semaphore
+) -> bool:
+    """Refresh and persist one account's token; return whether it is fresh afterwards."""
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        for account in accounts:
-            refresh_expires_at = account.get("refresh_expires_at")
-            if refresh_expires_at and parse_ts(refresh_expires_at) <= utcnow():
-                logger.warning(
-                    "Skipping TikTok token refresh because refresh token expired",
-                    extra={
-                        "user_id": account["user_id"],
-                        "open_id": account["open_id"],
-                    },
-                )
-                continue
+    refresh_expires_at = account.get("refresh_expires_at")
+    if refresh_expires_at and parse_ts(refresh_expires_at) <= utcnow():
+        logger.warning(
+            "Skipping TikTok token refresh because refresh token expired",
+            extra={"user_id": account["user_id"], "open_id": account["open_id"]},
+        )
+        return False
 
+    async with semaphore:
+        # Same lock as ensure_fresh_access, so a request cannot refresh it concurrently
+        async with token_cache.refresh_lock(account["user_id"], account["open_id"]):
+            # The snapshot may be stale by now: a request or another process
+            # may have refreshed (and rotated the refresh token) while we waited
             try:
-                payload = await _request_token_refresh(
-                    account["refresh_token"], client=client
+                record = await get_account_row(
+                    supabase, account["user_id"], account["open_id"]
                 )
+            except HTTPException:
+                return False  # unlinked since the snapshot
+            if parse_ts(record["expires_at"]) > utcnow() + timedelta(
+                seconds=REFRESH_MARGIN_SECONDS
+            ):
+                return True  # already refreshed
+            try:
+                payload = await _request_token_refresh(record["refresh_token"])
             except HTTPException as exc:
                 logger.warning(
                     "Failed to refresh TikTok token",
@@ -575,23 +600,67 @@ async def refresh_due_accounts(supabase) -> None:
                         "status_code": exc.status_code,
                     },
                 )
-                continue
+                return False
             except Exception:
                 logger.exception(
                     "Unexpected error refreshing TikTok token",
-                    extra={
-                        "user_id": account["user_id"],
-                        "open_id": account["open_id"],
-                    },
+                    extra={"user_id": account["user_id"], "open_id": account["open_id"]},
                 )
-                continue
+                return False
 
-            updates = _token_update_fields(
-                payload, fallback_refresh=account["refresh_token"]
+            updates = _token_update_fields(payload, fallback_refresh=record["refresh_token"])
+            # Written while the lock is held: TikTok has rotated the refresh
+            # token, and an update (unlike an upsert) cannot revive an
+            # account unlinked in the meantime
+            try:
+                await aexecute(
+                    supabase.table("tiktok_accounts")
+                    .update(updates)
+                    .eq("user_id", account["user_id"])
+                    .eq("open_id", account["open_id"])
+                )
+            except Exception:
+                logger.exception(
+                    "Failed to save refreshed TikTok token",
+                    extra={"user_id": account["user_id"], "open_id": account["open_id"]},
+                )
+                return False
+            await token_cache.store(
+                account["user_id"],
+                account["open_id"],
+                updates["access_token"],
+                parse_ts(updates["expires_at"]),
             )
-            supabase.table("tiktok_accounts").update(updates).eq(
-                "user_id", account["user_id"]
-            ).eq("open_id", account["open_id"]).execute()
+    return True
+
+
+async def refresh_due_accounts(supabase) -> Dict[str, Any]:
+    """Refresh every token expiring within the margin; return the cycle's summary."""
+
+    started = time.perf_counter()
+    threshold = (utcnow() + timedelta(seconds=REFRESH_MARGIN_SECONDS)).isoformat()
+    accounts = (
+        await aexecute(
+            supabase.table("tiktok_accounts")
+            .select("user_id,open_id,refresh_token,refresh_expires_at,expires_at")
+            .lte("expires_at", threshold)
+        )
+    ).data or []
+
+    refreshed = 0
+    if accounts:
+        semaphore = asyncio.Semaphore(REFRESH_CONCURRENCY)
+        results = await asyncio.gather(
+            *(_refresh_account(supabase, account, semaphore) for account in accounts)
+        )
+        refreshed = sum(results)
+
+    return {
+        "due": len(accounts),
+        "refreshed": refreshed,
+        "not_refreshed": len(accounts) - refreshed,
+        "duration_s": time.perf_counter() - started,
+    }
 
 
 async def tiktok_refresh_daemon(app: FastAPI, stop_event: asyncio.Event) -> None:
@@ -601,7 +670,16 @@ async def tiktok_refresh_daemon(app: FastAPI, stop_event: asyncio.Event) -> None
     while not stop_event.is_set():
         logger.info("Running TikTok token refresh check...")
         try:
-            await refresh_due_accounts(supabase)
+            summary = await refresh_due_accounts(supabase)
+            logger.info(
+                "TikTok token refresh cycle: due={due} refreshed={refreshed} "
+                "not_refreshed={not_refreshed} duration_s={duration_s:.2f}".format(**summary)
+            )
+            if summary["duration_s"] > interval:
+                logger.warning(
+                    f"TikTok token refresh cycle took {summary['duration_s']:.0f}s, "
+                    f"longer than its {interval}s interval"
+                )
         except Exception:  # pragma: no cover - defensive logging
             logger.exception("Error while refreshing TikTok tokens")
 
@@ -613,15 +691,15 @@ async def tiktok_refresh_daemon(app: FastAPI, stop_event: asyncio.Event) -> None
 
 async def fetch_profile(supabase, user_id: str, open_id: str) -> Dict[str, Any]:
     token = await ensure_fresh_access(supabase, user_id, open_id)
-    async with httpx.AsyncClient(timeout=15) as client:
-        response = await client.post(
-            CREATOR_Q,
-            json={},
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json; charset=UTF-8",
-            },
-        )
+    response = await get_http_client().post(
+        CREATOR_Q,
+        json={},
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=UTF-8",
+        },
+        timeout=15,
+    )
 
     if response.status_code != 200:
         raise HTTPException(response.status_code, response.text)
@@ -631,9 +709,12 @@ async def fetch_profile(supabase, user_id: str, open_id: str) -> Dict[str, Any]:
     handle = data.get("creator_nickname")
     avatar = data.get("creator_avatar_url")
 
-    supabase.table("tiktok_accounts").update(
-        {"handle": handle, "avatar_url": avatar}
-    ).eq("user_id", user_id).eq("open_id", open_id).execute()
+    await aexecute(
+        supabase.table("tiktok_accounts")
+        .update({"handle": handle, "avatar_url": avatar})
+        .eq("user_id", user_id)
+        .eq("open_id", open_id)
+    )
 
     return payload
 
@@ -649,15 +730,15 @@ async def publish_post(supabase, user_id: str, request: PostRequest) -> Dict[str
         "post_mode": "DIRECT_POST",
     }
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        response = await client.post(
-            POST_VIDEO_INIT,
-            json=payload,
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json; charset=UTF-8",
-            },
-        )
+    response = await get_http_client().post(
+        POST_VIDEO_INIT,
+        json=payload,
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=UTF-8",
+        },
+        timeout=60,
+    )
 
     if response.status_code != 200:
         raise HTTPException(response.status_code, response.text)
@@ -665,17 +746,21 @@ async def publish_post(supabase, user_id: str, request: PostRequest) -> Dict[str
     return response.json()
 
 
-def unlink_account(supabase, user_id: str, open_id: str) -> Dict[str, Any]:
-    supabase.table("tiktok_accounts").delete().eq("user_id", user_id).eq(
-        "open_id", open_id
-    ).execute()
+async def unlink_account(supabase, user_id: str, open_id: str) -> Dict[str, Any]:
+    await aexecute(
+        supabase.table("tiktok_accounts")
+        .delete()
+        .eq("user_id", user_id)
+        .eq("open_id", open_id)
+    )
+    await token_cache.evict(user_id, open_id)
     return {"unlinked": True}
 
 
-def create_relink_payload(
+async def create_relink_payload(
     supabase, user_id: str, request: RelinkRequest
 ) -> Dict[str, Any]:
-    get_account_row(supabase, user_id, request.open_id)
-    payload = create_authorize_payload(user_id, supabase)
+    await get_account_row(supabase, user_id, request.open_id)
+    payload = await create_authorize_payload(user_id, supabase)
     payload["open_id"] = request.open_id
     return payload
@@ -0,0 +1,175 @@
+"""Cache of TikTok access tokens, keyed by ``(user_id, open_id)``.
+
+Tokens live in process memory and in Redis, so other API processes and
+workers share them. Both copies expire ``TOKEN_MARGIN`` before the token
+itself does. ``refresh_lock`` makes sure only one caller per account
+refreshes at a time: an ``asyncio.Lock`` within the process and a Redis lock
+across processes. Evictions are published on ``EVICT_CHANNEL`` so that
+every API process running ``token_eviction_daemon`` drops the token from
+its memory as well.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+
+from src.auth.utils import parse_ts, utcnow
+from src.core.logging_config import logger
+from src.core.redis import get_redis
+from src.core.supabase import run_blocking
+
+# Tokens closer than this to expiry are treated as expired
+TOKEN_MARGIN = timedelta(seconds=60)
+LOCK_TIMEOUT_S = 30
+LOCK_POLL_S = 0.05
+EVICT_CHANNEL = "bulks:tiktok:token:evict"
+
+_memory: Dict[Tuple[str, str], Tuple[str, datetime]] = {}
+# [lock, number of holders and waiters]; dropped when that reaches zero
+_locks: Dict[Tuple[str, str], List] = {}
+
+
+def _redis_key(user_id: str, open_id: str) -> str:
+    return f"bulks:tiktok:token:{user_id}:{open_id}"
+
+
+def is_fresh(expires_at: datetime) -> bool:
+    return expires_at > utcnow() + TOKEN_MARGIN
+
+
+def get_cached(user_id: str, open_id: str) -> Optional[str]:
+    """The account's access token from process memory, if still fresh."""
+
+    entry = _memory.get((user_id, open_id))
+    if entry is None:
+        return None
+    token, expires_at = entry
+    if not is_fresh(expires_at):
+        _memory.pop((user_id, open_id), None)
+        return None
+    return token
+
+
+async def get_shared(user_id: str, open_id: str) -> Optional[str]:
+    """The account's access token from Redis, copied into process memory."""
+
+    raw = await run_blocking(get_redis().get, _redis_key(user_id, open_id))
+    if raw is None:
+        return None
+    entry = json.loads(raw)
+    expires_at = parse_ts(entry["expires_at"])
+    if not is_fresh(expires_at):
+        return None
+    _memory[(user_id, open_id)] = (entry["access_token"], expires_at)
+    return entry["access_token"]
+
+
+async def store(user_id: str, open_id: str, access_token: str, expires_at: datetime) -> None:
+    """Cache a token in memory and Redis until ``TOKEN_MARGIN`` before it expires."""
+
+    if not is_fresh(expires_at):
+        return
+    _memory[(user_id, open_id)] = (access_token, expires_at)
+    ttl = int((expires_at - TOKEN_MARGIN - utcnow()).total_seconds())
+    if ttl > 0:
+        await run_blocking(
+            get_redis().set,
+            _redis_key(user_id, open_id),
+            json.dumps({"access_token": access_token, "expires_at": expires_at.isoformat()}),
+            ex=ttl,
+        )
+
+
+def _evict_shared(user_id: str, open_id: str) -> None:
+    pipe = get_redis().pipeline()
+    pipe.delete(_redis_key(user_id, open_id))
+    pipe.publish(EVICT_CHANNEL, json.dumps([user_id, open_id]))
+    pipe.execute()
+
+
+async def evict(user_id: str, open_id: str) -> None:
+    """Drop the account's token here, in Redis and in the other API processes."""
+
+    _memory.pop((user_id, open_id), None)
+    await run_blocking(_evict_shared, user_id, open_id)
+
+
+async def token_eviction_daemon(app: FastAPI, stop_event: asyncio.Event) -> None:
+    """Drop tokens evicted by other processes from this process' memory."""
+
+    while not stop_event.is_set():
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            await asyncio.to_thread(pubsub.subscribe, EVICT_CHANNEL)
+            _memory.clear()  # evictions may have been missed while unsubscribed
+            while not stop_event.is_set():
+                message = await asyncio.to_thread(pubsub.get_message, timeout=1.0)
+                if message is not None:
+                    user_id, open_id = json.loads(message["data"])
+                    _memory.pop((user_id, open_id), None)
+        except Exception:
+            logger.exception("TikTok token eviction listener failed, resubscribing")
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=LOCK_TIMEOUT_S)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            pubsub.close()
+
+
+@asynccontextmanager
+async def refresh_lock(user_id: str, open_id: str) -> AsyncIterator[None]:
+    """Hold the account's refresh lock in this process and in Redis.
+
+    If the Redis lock cannot be had within ``LOCK_TIMEOUT_S`` (say its owner
+    died), the caller proceeds anyway rather than failing the request.
+    """
+
+    entry = _locks.setdefault((user_id, open_id), [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            async with _shared_refresh_lock(user_id, open_id):
+                yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _locks[(user_id, open_id)]
+
+
+@asynccontextmanager
+async def _shared_refresh_lock(user_id: str, open_id: str) -> AsyncIterator[None]:
+    """The cross-process half of ``refresh_lock``."""
+
+    # Not thread-local: acquire and release may run on different pool threads
+    shared = get_redis().lock(
+        f"{_redis_key(user_id, open_id)}:refresh",
+        timeout=LOCK_TIMEOUT_S,
+        thread_local=False,
+    )
+    deadline = asyncio.get_running_loop().time() + LOCK_TIMEOUT_S
+    acquired = False
+    while not acquired:
+        acquired = await run_blocking(shared.acquire, blocking=False)
+        if acquired or asyncio.get_running_loop().time() >= deadline:
+            break
+        await asyncio.sleep(LOCK_POLL_S)
+    if not acquired:
+        logger.warning(
+            "Proceeding without TikTok refresh lock",
+            extra={"user_id": user_id, "open_id": open_id},
+        )
+    try:
+        yield
+    finally:
+        if acquired:
+            try:
+                await run_blocking(shared.release)
+            except Exception:
+                logger.warning("TikTok refresh lock expired before release")
@@ -10,6 +10,8 @@ from PIL import Image, ImageDraw, ImageFont, ImageFilter
 from moviepy import ImageClip
 import textwrap
 
+from src.lib.captioning.masks import rounded_rects_mask
+
 
 def _create_rounded_background(width, height, color, border_radius, opacity=1.0):
     """
@@ -72,11 +74,6 @@ def _draw_unified_adaptive_background(img, text_lines, line_bboxes, line_height,
                                     bg_color, scaled_bg_padding, scaled_border_radius,
                                     bg_opacity, canvas_width):
     """Draw a unified background that flows smoothly between lines with different widths"""
-    from PIL import ImageDraw
-    
-    # Create overlay for drawing the unified background
-    overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(overlay)
     
     # Apply opacity to background color
     r, g, b = bg_color
@@ -103,150 +100,82 @@ def _draw_unified_adaptive_background(img, text_lines, line_bboxes, line_height,
         line_bg_x = (canvas_width - line_bg_width) // 2
         line_bg_y = int(y_offset - scaled_bg_padding)
         
-        segments.append({
-            'x': line_bg_x,
-            'y': line_bg_y,
-            'width': line_bg_width,
-            'height': line_bg_height,
-            'line_index': i
-        })
+        segments.append((
+            line_bg_x,
+            line_bg_y,
+            line_bg_x + line_bg_width - 1,
+            line_bg_y + line_bg_height - 1,
+        ))
         
         y_offset += line_height
     
     if not segments:
         return
     
-    # Draw unified background shape by creating connected segments
-    for i, segment in enumerate(segments):
-        x, y, width, height = segment['x'], segment['y'], segment['width'], segment['height']
-        
-        if i == 0:
-            # First segment - rounded top
-            if scaled_border_radius > 0:
-                # Top part with rounded corners
-                draw.rounded_rectangle(
-                    [(x, y), (x + width - 1, y + height - 1)],
-                    radius=scaled_border_radius,
-                    fill=fill_color
-                )
-            else:
-                draw.rectangle([(x, y), (x + width - 1, y + height - 1)], fill=fill_color)
-        
-        elif i == len(segments) - 1:
-            # Last segment - rounded bottom, connect to previous
-            prev_segment = segments[i - 1]
-            
-            # Draw connection between segments
-            _draw_segment_connection(draw, prev_segment, segment, fill_color)
-            
-            # Draw the segment itself
-            if scaled_border_radius > 0:
-                draw.rounded_rectangle(
-                    [(x, y), (x + width - 1, y + height - 1)],
-                    radius=scaled_border_radius,
-                    fill=fill_color
-                )
-            else:
-                draw.rectangle([(x, y), (x + width - 1, y + height - 1)], fill=fill_color)
-        
-        else:
-            # Middle segment - connect to previous and draw rectangle
-            prev_segment = segments[i - 1]
-            
-            # Draw connection between segments
-            _draw_segment_connection(draw, prev_segment, segment, fill_color)
-            
-            # Draw the segment itself (no rounding for middle segments)
-            draw.rectangle([(x, y), (x + width - 1, y + height - 1)], fill=fill_color)
+    # First and last segments are rounded, middle ones stay square; every
+    # segment is joined to the next so the shape reads as one background
+    radii = [0] * len(segments)
+    radii[0] = radii[-1] = scaled_border_radius
+    mask = rounded_rects_mask(img.size, segments, radii, connect=True, value=alpha)
     
-    # Composite the overlay onto the main image
-    img.paste(overlay, (0, 0), overlay)
+    # Composite the background onto the main image in one pass
+    img.paste(Image.new('RGBA', img.size, fill_color), (0, 0), Image.fromarray(mask))
 
 
-def _draw_segment_connection(draw, prev_segment, curr_segment, fill_color):
-    """Draw a smooth connection between two background segments"""
-    # Get coordinates for both segments
-    prev_x, prev_y = prev_segment['x'], prev_segment['y']
-    prev_width, prev_height = prev_segment['width'], prev_segment['height']
-    prev_bottom = prev_y + prev_height
-    
-    curr_x, curr_y = curr_segment['x'], curr_segment['y']
-    curr_width = curr_segment['width']
-    
-    # Calculate connection polygon points
-    # Start from bottom of previous segment
-    prev_left = prev_x
-    prev_right = prev_x + prev_width
-    
-    # End at top of current segment  
-    curr_left = curr_x
-    curr_right = curr_x + curr_width
-    
-    # Create trapezoid/polygon to connect the segments smoothly
-    connection_points = [
-        (prev_left, prev_bottom),   # Bottom left of previous
-        (prev_right, prev_bottom),  # Bottom right of previous
-        (curr_right, curr_y),       # Top right of current
-        (curr_left, curr_y),        # Top left of current
-    ]
-    
-    # Draw the connecting polygon
-    draw.polygon(connection_points, fill=fill_color)
+def _composite_text_shadow(img, font, placements, shadow_color, shadow_offset, shadow_blur):
+    """
+    Draw the shadow of every line onto one layer and composite it once
 
+    The layer only covers the union of the shadow glyph boxes (grown by the
+    blur reach), so the blur runs over the text region instead of the canvas.
 
-def create_high_quality_text_clip(text, config, video_duration):
-    """
-    Create high-quality text clip using PIL for anti-aliased rendering
-    
     Args:
-        text (str): Text to render
-        config (dict): Text configuration options
-        video_duration (float): Video duration
-        
-    Returns:
-        ImageClip: High-quality text clip
+        img (PIL.Image): RGBA canvas, modified in place
+        font (ImageFont): Font used for the text
+        placements (list): (line, x, y, bbox) tuples for non-empty lines
+        shadow_color (tuple): RGB shadow color
+        shadow_offset (tuple): Scaled (dx, dy) shadow offset
+        shadow_blur (float): Scaled Gaussian blur radius
     """
-    
-    # Default configuration
-    defaults = {
-        'fontsize': 50,
-        'color': 'white',
-        'stroke_color': 'black', 
-        'stroke_width': 2,
-        'font_path': None,  # Custom font path
-        'max_width': 600,   # Maximum text width
-        'line_spacing': 1.2,  # Line spacing multiplier
-        'quality_scale': 2,   # Render quality scale multiplier (higher = better quality)
-        'shadow_offset': (2, 2),  # Shadow offset
-        'shadow_color': 'black',  # Shadow color
-        'shadow_blur': 1,     # Shadow blur radius
-        'add_shadow': False,  # Whether to add shadow
-        'background_color': None,  # Background color
-        'background_opacity': 0.8,  # Background opacity
-        'background_padding': 20,   # Background padding
-        'border_radius': 10,        # Border radius
-        # Background is always fixed mode now
-    }
-    
-    style = {**defaults, **config}
-    
-    # Quality scale factor - render at higher resolution then scale down
-    scale = style['quality_scale']
-    scaled_fontsize = style['fontsize'] * scale
-    scaled_stroke_width = style['stroke_width'] * scale
-    scaled_max_width = style['max_width'] * scale
-    
-    # Try to load font
+    dx, dy = shadow_offset
+    # Gaussian support is effectively ~3 sigma; keep the falloff inside the layer
+    reach = int(np.ceil(shadow_blur * 3)) if shadow_blur > 0 else 0
+
+    left = min(x + dx + bbox[0] for _, x, _, bbox in placements) - reach
+    top = min(y + dy + bbox[1] for _, _, y, bbox in placements) - reach
+    right = max(x + dx + bbox[2] for _, x, _, bbox in placements) + reach
+    bottom = max(y + dy + bbox[3] for _, _, y, bbox in placements) + reach
+
+    left, top = max(0, int(left)), max(0, int(top))
+    right, bottom = min(img.width, int(np.ceil(right))), min(img.height, int(np.ceil(bottom)))
+    if right <= left or bottom <= top:
+        return
+
+    shadow_img = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+    shadow_draw = ImageDraw.Draw(shadow_img)
+    for line, x, y, _ in placements:
+        shadow_draw.text((x + dx - left, y + dy - top), line, font=font, fill=shadow_color)
+
+    # Apply blur effect
+    if shadow_blur > 0:
+        shadow_img = shadow_img.filter(ImageFilter.GaussianBlur(shadow_blur))
+
+    # Merge shadow
+    img.alpha_composite(shadow_img, dest=(left, top))
+
+
+def _load_font(style, size):
+    """Load the configured font, falling back to the bundled TikTok font, system fonts, then PIL's default"""
     font = None
     try:
         if style['font_path'] and os.path.exists(style['font_path']):
-            font = ImageFont.truetype(style['font_path'], size=scaled_fontsize)
+            font = ImageFont.truetype(style['font_path'], size=size)
             print(f"✅ Loaded custom font: {style['font_path']}")
         else:
             # Try to load TikTok font from project
             tiktok_font_path = 'TikTokSans-VariableFont_opsz,slnt,wdth,wght.ttf'
             if os.path.exists(tiktok_font_path):
-                font = ImageFont.truetype(tiktok_font_path, size=scaled_fontsize)
+                font = ImageFont.truetype(tiktok_font_path, size=size)
                 print(f"✅ Loaded TikTok font: {tiktok_font_path}")
             else:
                 # Try system default fonts
@@ -259,7 +188,7 @@ def create_high_quality_text_clip(text, config, video_duration):
                     ]
                     for font_path in system_fonts:
                         if os.path.exists(font_path):
-                            font = ImageFont.truetype(font_path, size=scaled_fontsize)
+                            font = ImageFont.truetype(font_path, size=size)
                             print(f"✅ Loaded system font: {font_path}")
                             break
                 except:
@@ -273,43 +202,91 @@ def create_high_quality_text_clip(text, config, video_duration):
     except Exception as e:
         print(f"⚠️ Font loading failed: {e}, using default font")
         font = ImageFont.load_default()
+
+    return font
+
+
+def _wrap_text(text, font, max_width):
+    """Smart text wrapping"""
+    lines = []
+    paragraphs = text.split('\n')
     
-    # Text wrapping handling
-    def wrap_text(text, font, max_width):
-        """Smart text wrapping"""
-        lines = []
-        paragraphs = text.split('\n')
-        
-        for paragraph in paragraphs:
-            if not paragraph.strip():
-                lines.append('')
-                continue
-                
-            # Calculate characters per line
-            avg_char_width = font.getbbox('M')[2]  # Use M character width as average width
-            chars_per_line = max(10, max_width // avg_char_width)
-            
-            # Use textwrap for initial line breaking
-            wrapped = textwrap.wrap(paragraph, width=chars_per_line)
+    for paragraph in paragraphs:
+        if not paragraph.strip():
+            lines.append('')
+            continue
             
-            # Further optimize to ensure each line doesn't exceed max width
-            for line in wrapped:
-                while font.getbbox(line)[2] > max_width and len(line) > 1:
-                    # If line is too long, continue splitting
-                    words = line.split()
-                    if len(words) <= 1:
-                        break
-                    line = ' '.join(words[:-1])
-                    # Add remaining words to next line
-                    if len(words) > 1:
-                        remaining = ' '.join(words[-1:])
-                        wrapped.insert(wrapped.index(' '.join(words)) + 1, remaining)
-                lines.append(line)
+        # Calculate characters per line
+        avg_char_width = font.getbbox('M')[2]  # Use M character width as average width
+        chars_per_line = max(10, max_width // avg_char_width)
+        
+        # Use textwrap for initial line breaking
+        wrapped = textwrap.wrap(paragraph, width=chars_per_line)
         
-        return lines
+        # Further optimize to ensure each line doesn't exceed max width
+        for line in wrapped:
+            while font.getbbox(line)[2] > max_width and len(line) > 1:
+                # If line is too long, continue splitting
+                words = line.split()
+                if len(words) <= 1:
+                    break
+                line = ' '.join(words[:-1])
+                # Add remaining words to next line
+                if len(words) > 1:
+                    remaining = ' '.join(words[-1:])
+                    wrapped.insert(wrapped.index(' '.join(words)) + 1, remaining)
+            lines.append(line)
+    
+    return lines
+
+
+def compute_text_layout(text, config):
+    """
+    Load the font, wrap and measure text once for rendering and positioning
+    
+    Args:
+        text (str): Text to lay out
+        config (dict): Text configuration options
+        
+    Returns:
+        dict: Layout with the merged style, font, scale, lines, line bboxes,
+            line height, padding, high-resolution canvas size and the final
+            (downscaled) width/height
+    """
+    
+    # Default configuration
+    defaults = {
+        'fontsize': 50,
+        'color': 'white',
+        'stroke_color': 'black', 
+        'stroke_width': 2,
+        'font_path': None,  # Custom font path
+        'max_width': 600,   # Maximum text width
+        'line_spacing': 1.2,  # Line spacing multiplier
+        'quality_scale': 2,   # Render quality scale multiplier (higher = better quality)
+        'shadow_offset': (2, 2),  # Shadow offset
+        'shadow_color': 'black',  # Shadow color
+        'shadow_blur': 1,     # Shadow blur radius
+        'add_shadow': False,  # Whether to add shadow
+        'background_color': None,  # Background color
+        'background_opacity': 0.8,  # Background opacity
+        'background_padding': 20,   # Background padding
+        'border_radius': 10,        # Border radius
+        # Background is always fixed mode now
+    }
+    
+    style = {**defaults, **config}
+    
+    # Quality scale factor - render at higher resolution then scale down
+    scale = style['quality_scale']
+    scaled_fontsize = style['fontsize'] * scale
+    scaled_stroke_width = style['stroke_width'] * scale
+    scaled_max_width = style['max_width'] * scale
+    
+    font = _load_font(style, scaled_fontsize)
     
     # Wrap text
-    text_lines = wrap_text(text, font, scaled_max_width)
+    text_lines = _wrap_text(text, font, scaled_max_width)
     
     # Calculate text dimensions
     line_height = int(scaled_fontsize * style['line_spacing'])
@@ -335,10 +312,54 @@ def create_high_quality_text_clip(text, config, video_duration):
         shadow_padding = max(abs(style['shadow_offset'][0]), abs(style['shadow_offset'][1])) + style['shadow_blur']
         padding = max(padding, shadow_padding * scale)
     
-    # Create canvas
+    # Canvas size
     canvas_width = int(max_line_width + padding * 2)
     canvas_height = int(total_height + padding * 2)
     
+    return {
+        'style': style,
+        'font': font,
+        'scale': scale,
+        'lines': text_lines,
+        'line_bboxes': line_bboxes,
+        'line_height': line_height,
+        'padding': padding,
+        'canvas_width': canvas_width,
+        'canvas_height': canvas_height,
+        'width': canvas_width // scale if scale > 1 else canvas_width,
+        'height': canvas_height // scale if scale > 1 else canvas_height,
+    }
+
+
+def create_high_quality_text_clip(text, config, video_duration, layout=None):
+    """
+    Create high-quality text clip using PIL for anti-aliased rendering
+    
+    Args:
+        text (str): Text to render
+        config (dict): Text configuration options
+        video_duration (float): Video duration
+        layout (dict): Precomputed result of compute_text_layout (optional)
+        
+    Returns:
+        ImageClip: High-quality text clip
+    """
+    
+    if layout is None:
+        layout = compute_text_layout(text, config)
+    
+    style = layout['style']
+    scale = layout['scale']
+    font = layout['font']
+    text_lines = layout['lines']
+    line_bboxes = layout['line_bboxes']
+    line_height = layout['line_height']
+    padding = layout['padding']
+    canvas_width = layout['canvas_width']
+    canvas_height = layout['canvas_height']
+    scaled_fontsize = style['fontsize'] * scale
+    scaled_stroke_width = style['stroke_width'] * scale
+    
     # Create high-resolution canvas
     img = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
@@ -398,38 +419,29 @@ def create_high_quality_text_clip(text, config, video_duration):
             style['background_opacity'], canvas_width
         )
     
-    # Draw text
+    # Line placements (text, x, y, bbox) shared by the shadow and text passes
+    placements = []
     y_offset = padding
-    
+
     for i, line in enumerate(text_lines):
-        if not line.strip():  # Empty line
-            y_offset += line_height
-            continue
-        
-        bbox = line_bboxes[i]
-        line_width = bbox[2] - bbox[0]
-        
-        # Center align
-        x_offset = (canvas_width - line_width) // 2
-        
-        # Draw shadow (if enabled)
-        if style['add_shadow']:
-            shadow_x = x_offset + style['shadow_offset'][0] * scale
-            shadow_y = y_offset + style['shadow_offset'][1] * scale
-            
-            # Create shadow layer
-            shadow_img = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
-            shadow_draw = ImageDraw.Draw(shadow_img)
-            shadow_draw.text((shadow_x, y_offset), line, font=font, fill=shadow_color)
-            
-            # Apply blur effect
-            if style['shadow_blur'] > 0:
-                shadow_img = shadow_img.filter(ImageFilter.GaussianBlur(style['shadow_blur'] * scale))
-            
-            # Merge shadow
-            img = Image.alpha_composite(img, shadow_img)
-            draw = ImageDraw.Draw(img)
-        
+        if line.strip():
+            bbox = line_bboxes[i]
+            line_width = bbox[2] - bbox[0]
+            # Center align
+            x_offset = (canvas_width - line_width) // 2
+            placements.append((line, x_offset, y_offset, bbox))
+        y_offset += line_height
+
+    # Draw shadow (if enabled) - one layer, one blur, one composite for all lines
+    if style['add_shadow'] and placements:
+        _composite_text_shadow(
+            img, font, placements, shadow_color,
+            (style['shadow_offset'][0] * scale, style['shadow_offset'][1] * scale),
+            style['shadow_blur'] * scale
+        )
+
+    # Draw text
+    for line, x_offset, y_offset, bbox in placements:
         # Draw stroke (by drawing text at multiple positions)
         if scaled_stroke_width > 0:
             for dx in range(-scaled_stroke_width, scaled_stroke_width + 1):
@@ -439,8 +451,6 @@ def create_high_quality_text_clip(text, config, video_duration):
         
         # Draw main text
         draw.text((x_offset, y_offset), line, font=font, fill=text_color)
-        
-        y_offset += line_height
     
     # Scale to target size (anti-aliased)
     if scale > 1:
@@ -462,81 +472,19 @@ def create_high_quality_text_clip(text, config, video_duration):
     return clip
 
 
-def get_text_dimensions(text, config):
+def get_text_dimensions(text, config, layout=None):
     """
     Get text dimensions for positioning calculations
     
     Args:
         text (str): Text content
         config (dict): Text configuration
+        layout (dict): Precomputed result of compute_text_layout (optional)
         
     Returns:
-        tuple: (width, height) text dimensions
+        tuple: (width, height) dimensions of the rendered text clip
     """
-    defaults = {
-        'fontsize': 50,
-        'font_path': None,
-        'max_width': 600,
-        'line_spacing': 1.2,
-        'stroke_width': 2,
-        'quality_scale': 2,
-        'background_color': None,
-        'background_padding': 20,
-        # Background is always fixed mode
-    }
-    
-    style = {**defaults, **config}
-    scale = style['quality_scale']
-    scaled_fontsize = style['fontsize'] * scale
-    scaled_stroke_width = style['stroke_width'] * scale
-    scaled_max_width = style['max_width'] * scale
-    
-    # Load font (simplified version)
-    font = None
-    try:
-        if style['font_path'] and os.path.exists(style['font_path']):
-            font = ImageFont.truetype(style['font_path'], size=scaled_fontsize)
-        else:
-            tiktok_font_path = 'TikTokSans-VariableFont_opsz,slnt,wdth,wght.ttf'
-            if os.path.exists(tiktok_font_path):
-                font = ImageFont.truetype(tiktok_font_path, size=scaled_fontsize)
-            else:
-                font = ImageFont.load_default()
-    except:
-        font = ImageFont.load_default()
-    
-    # Simple text wrapping
-    lines = []
-    for paragraph in text.split('\n'):
-        if paragraph.strip():
-            avg_char_width = font.getbbox('M')[2]
-            chars_per_line = max(10, scaled_max_width // avg_char_width)
-            wrapped = textwrap.wrap(paragraph, width=chars_per_line)
-            lines.extend(wrapped)
-        else:
-            lines.append('')
-    
-    # Calculate dimensions
-    line_height = int(scaled_fontsize * style['line_spacing'])
-    max_width = 0
-    total_height = len(lines) * line_height
-    
-    for line in lines:
-        if line.strip():
-            bbox = font.getbbox(line)
-            line_width = bbox[2] - bbox[0]
-            max_width = max(max_width, line_width)
-    
-    # Add stroke space
-    padding = max(scaled_stroke_width * 2, 10 * scale)
-    
-    # Add background padding if background is enabled
-    if style['background_color'] is not None:
-        bg_padding = style['background_padding'] * scale
-        # Add background padding
-        padding = max(padding, bg_padding)
-    
-    final_width = (max_width + padding * 2) // scale
-    final_height = (total_height + padding * 2) // scale
+    if layout is None:
+        layout = compute_text_layout(text, config)
     
-    return (final_width, final_height)
+    return (layout['width'], layout['height'])
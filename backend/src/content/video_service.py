@@ -5,12 +5,20 @@ This is a supplement to the original video_service.py, providing higher quality
 """
 
 import os
+import tempfile
+import uuid
 from moviepy import VideoFileClip, CompositeVideoClip, ImageClip
 import numpy as np
 from PIL import Image, ImageDraw
 
+from src.lib.scratch import scratch_dir
+
 # Import high-quality text renderer
-from .hq_text_renderer import create_high_quality_text_clip, get_text_dimensions
+from .hq_text_renderer import (
+    compute_text_layout,
+    create_high_quality_text_clip,
+    get_text_dimensions,
+)
 
 
 def _calculate_text_position(position, relative, video_w, video_h, text_w, text_h):
@@ -147,11 +155,14 @@ def overlay_high_quality_text_on_video(video_path, text, config=None):
         if style['max_width'] > video_width * 0.9:
             style['max_width'] = int(video_width * 0.8)
         
+        # Wrap and measure once; rendering and positioning share the layout
+        layout = compute_text_layout(text, style)
+        
         # Create high-quality text clip
-        text_clip = create_high_quality_text_clip(text, style, video.duration)
+        text_clip = create_high_quality_text_clip(text, style, video.duration, layout=layout)
         
         # Get text dimensions for positioning
-        text_w, text_h = get_text_dimensions(text, style)
+        text_w, text_h = get_text_dimensions(text, style, layout=layout)
         video_w, video_h = video.size
         
         # Calculate text position
@@ -190,7 +201,11 @@ def overlay_high_quality_text_on_video(video_path, text, config=None):
             style['output_path'],
             codec='libx264',
             audio_codec='aac',
-            temp_audiofile='temp-audio.m4a',
+            temp_audiofile=os.path.join(
+                # AAC well under 256 kbit/s
+                scratch_dir(int(video.duration * 32_000)) or tempfile.gettempdir(),
+                f"temp-audio-{uuid.uuid4().hex}.m4a",
+            ),
             remove_temp=True
         )
         
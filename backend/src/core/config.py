@@ -1,6 +1,7 @@
 """Core configuration settings."""
 
 import os
+import tempfile
 from typing import Optional
 from dotenv import load_dotenv
 
@@ -13,14 +14,114 @@ class Settings:
     def __init__(self):
         self.environment = os.environ.get("ENV", "development")
         self.redis_url: str = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+        # Queue routing: jobs of at most INTERACTIVE_MAX_ITEMS items (or draft
+        # renders) go to "interactive", jobs of BULK_MIN_ITEMS or more to "bulk"
+        self.interactive_max_items: int = int(os.environ.get("INTERACTIVE_MAX_ITEMS", "1"))
+        self.bulk_min_items: int = int(os.environ.get("BULK_MIN_ITEMS", "10"))
+        # Fair-share dispatch: jobs a user may have queued or running at once
+        # (0 = no cap), and how many jobs each RQ queue holds ready for workers
+        self.fair_user_max_running: int = int(os.environ.get("FAIR_USER_MAX_RUNNING", "2"))
+        self.fair_ready_depth: int = int(os.environ.get("FAIR_READY_DEPTH", "2"))
+        self.fair_dispatch_interval_s: float = float(
+            os.environ.get("FAIR_DISPATCH_INTERVAL_S", "5")
+        )
+        # Admission control per job type (<TYPE>_RATE_PER_MIN, <TYPE>_BURST,
+        # <TYPE>_MAX_BACKLOG): a per-user token bucket refilled with that many
+        # generated items per minute up to the burst, and the most jobs the
+        # routed queue may hold before new requests are turned away.
+        # POST /workflow/bulk is limited separately (BULK_CAROUSEL_*,
+        # BULK_VIDEO_*), with a burst sized for a whole batch
+        self.admission_limits: dict = {
+            job_type: {
+                "rate_per_min": float(os.environ.get(f"{job_type}_RATE_PER_MIN", rate)),
+                "burst": float(os.environ.get(f"{job_type}_BURST", burst)),
+                "max_backlog": int(os.environ.get(f"{job_type}_MAX_BACKLOG", backlog)),
+            }
+            for job_type, rate, burst, backlog in (
+                ("CAROUSEL", "30", "60", "500"),
+                ("VIDEO", "10", "20", "200"),
+                ("BULK_CAROUSEL", "300", "1000", "1000"),
+                ("BULK_VIDEO", "100", "500", "500"),
+            )
+        }
+        self.admission_backlog_retry_after_s: int = int(
+            os.environ.get("ADMISSION_BACKLOG_RETRY_AFTER_S", "30")
+        )
+        # Idempotency-Key: how long a submission's response is replayed, and
+        # how long a duplicate waits for an in-flight original
+        self.idempotency_ttl_s: int = int(os.environ.get("IDEMPOTENCY_TTL_S", "86400"))
+        self.idempotency_wait_s: float = float(os.environ.get("IDEMPOTENCY_WAIT_S", "10"))
+        # Scheduled publishing: the timer sleeps until the next due post but
+        # at most PUBLISH_TIMER_MAX_SLEEP_S, fires up to PUBLISH_TIMER_BATCH
+        # posts per wake-up, and re-indexes Supabase's scheduled posts every
+        # PUBLISH_RECONCILE_INTERVAL_S. Posts stuck "publishing" for
+        # PUBLISH_CLAIM_TIMEOUT_S are marked failed; on shutdown, in-flight
+        # publishes get PUBLISH_SHUTDOWN_GRACE_S to finish
+        self.publish_timer_max_sleep_s: float = float(
+            os.environ.get("PUBLISH_TIMER_MAX_SLEEP_S", "5")
+        )
+        self.publish_timer_batch: int = int(os.environ.get("PUBLISH_TIMER_BATCH", "100"))
+        self.publish_reconcile_interval_s: float = float(
+            os.environ.get("PUBLISH_RECONCILE_INTERVAL_S", "300")
+        )
+        self.publish_claim_timeout_s: float = float(
+            os.environ.get("PUBLISH_CLAIM_TIMEOUT_S", "600")
+        )
+        self.publish_shutdown_grace_s: float = float(
+            os.environ.get("PUBLISH_SHUTDOWN_GRACE_S", "10")
+        )
         self.output_dir: str = os.environ.get("OUTPUT_DIR", "./outputs")
+        # Resized derivatives of outputs; kept outside output_dir so they are not served raw
+        self.thumbnail_dir: str = os.environ.get("THUMBNAIL_DIR", "./thumbnails")
+        # Output retention: age limit, disk high/low-water fractions, and the
+        # minimum age before a job may be evicted for space
+        self.output_retention_days: float = float(
+            os.environ.get("OUTPUT_RETENTION_DAYS", "14")
+        )
+        self.output_high_water: float = float(os.environ.get("OUTPUT_HIGH_WATER", "0.85"))
+        self.output_low_water: float = float(os.environ.get("OUTPUT_LOW_WATER", "0.75"))
+        self.output_min_age_s: float = float(os.environ.get("OUTPUT_MIN_AGE_S", "3600"))
+        self.output_retention_interval_s: float = float(
+            os.environ.get("OUTPUT_RETENTION_INTERVAL_S", "3600")
+        )
+        # Scratch space for intermediate render files: RAM-backed when
+        # /dev/shm exists, with a disk fallback once SCRATCH_MAX_BYTES is used
+        disk_scratch = os.path.join(tempfile.gettempdir(), "bulks-scratch")
+        self.scratch_dir: str = os.environ.get(
+            "SCRATCH_DIR",
+            "/dev/shm/bulks-scratch" if os.path.isdir("/dev/shm") else disk_scratch,
+        )
+        self.scratch_fallback_dir: str = os.environ.get(
+            "SCRATCH_FALLBACK_DIR", disk_scratch
+        )
+        self.scratch_max_bytes: int = int(
+            os.environ.get("SCRATCH_MAX_BYTES", str(512 * 1024 * 1024))
+        )
         self.font_path: str = os.environ.get(
             "FONT_PATH", "./TikTokSans-VariableFont_opsz,slnt,wdth,wght.ttf"
         )
         self.video_dir: str = os.environ.get("VIDEO_DIR", "./scraped-video")
+        # Seconds of background clip encoded behind a caption; 0 keeps the full clip
+        self.video_max_duration: float = float(
+            os.environ.get("VIDEO_MAX_DURATION", "10")
+        )
         self.supabase_url: str = os.environ.get("SUPABASE_URL")
         self.supabase_key: str = os.environ.get("SUPABASE_KEY")
         self.supabase_jwt: str = os.environ.get("SUPABASE_JWT_KEY")
+        # Shared HTTP client for the TikTok API: HTTP/2 when h2 is installed,
+        # pool limits, and default timeouts (individual calls may override)
+        self.http2: bool = os.environ.get("HTTP2", "1").lower() not in ("0", "false", "no")
+        self.http_max_connections: int = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+        self.http_max_keepalive: int = int(os.environ.get("HTTP_MAX_KEEPALIVE", "20"))
+        self.http_keepalive_expiry_s: float = float(
+            os.environ.get("HTTP_KEEPALIVE_EXPIRY_S", "60")
+        )
+        self.http_timeout_s: float = float(os.environ.get("HTTP_TIMEOUT_S", "30"))
+        self.http_connect_timeout_s: float = float(
+            os.environ.get("HTTP_CONNECT_TIMEOUT_S", "5")
+        )
+        # Threads for Supabase queries issued from async code
+        self.supabase_max_workers: int = int(os.environ.get("SUPABASE_MAX_WORKERS", "16"))
 
         self.base_url: str = (
             "https://api.theblucks.com/"
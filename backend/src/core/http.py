@@ -0,0 +1,49 @@
+"""Shared HTTP client for TikTok API traffic."""
+import importlib.util
+from typing import Optional
+
+import httpx
+
+from .config import settings
+from .logging_config import logger
+
+# Global client, opened and closed by the app lifespan
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Pooled client that keeps connections to the TikTok API warm between calls."""
+    http2 = settings.http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP2 is enabled but the h2 package is missing; using HTTP/1.1")
+        http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_expiry_s,
+        ),
+        timeout=httpx.Timeout(settings.http_timeout_s, connect=settings.http_connect_timeout_s),
+    )
+
+
+def init_http_client() -> httpx.AsyncClient:
+    global _client
+    _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared client, creating it on first use outside the app lifespan."""
+    global _client
+    if _client is None:
+        _client = create_http_client()
+    return _client
@@ -0,0 +1,52 @@
+"""Atomic Redis token buckets."""
+import math
+from typing import Tuple
+
+from redis import Redis
+
+# Refills the bucket for the time elapsed since its last use, then takes
+# ``cost`` tokens if there are enough. Returns {allowed, retry_after_ms}.
+# The clock is Redis' own, so API processes with skewed clocks agree.
+# KEYS: bucket.  ARGV: rate (tokens/s), capacity, cost
+_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return {allowed, retry_after}
+"""
+
+
+def take_tokens(
+    redis: Redis, key: str, rate: float, capacity: float, cost: float = 1
+) -> Tuple[bool, int]:
+    """Take ``cost`` tokens from the bucket at ``key``.
+
+    The bucket holds up to ``capacity`` tokens and refills at ``rate`` per
+    second. Returns whether the tokens were taken and, if not, the whole
+    seconds until they will be available. A ``cost`` above ``capacity``
+    could never be paid and raises ``ValueError``.
+    """
+    if rate <= 0:
+        raise ValueError("rate must be greater than zero")
+    if cost > capacity:
+        raise ValueError(f"cost {cost} exceeds the bucket capacity {capacity}")
+    allowed, retry_after_ms = redis.eval(_TOKEN_BUCKET, 1, key, rate, capacity, cost)
+    return bool(allowed), math.ceil(int(retry_after_ms) / 1000)
@@ -1,14 +1,24 @@
 """Redis connection and queue management."""
-from typing import Generator, Optional
+from typing import Dict, Generator, Optional
 from redis import Redis
 from rq import Queue
 from fastapi import Depends
 
 from .config import settings
 
+# Job queues by type, with the share of dequeues each gets when all are
+# backed up. Routing lives in workflow/router.py.
+QUEUE_WEIGHTS: Dict[str, int] = {
+    "interactive": 8,
+    "carousel": 4,
+    "video": 2,
+    "bulk": 1,
+}
+DEFAULT_QUEUE = "carousel"
+
 # Global Redis connection instance
 _redis: Optional[Redis] = None
-_queue: Optional[Queue] = None
+_queues: Dict[str, Queue] = {}
 
 def get_redis() -> Redis:
     """Get Redis connection instance."""
@@ -17,12 +27,26 @@ def get_redis() -> Redis:
         _redis = Redis.from_url(settings.redis_url)
     return _redis
 
-def get_queue(redis: Redis = Depends(get_redis)) -> Queue:
-    """Get Redis Queue instance."""
-    global _queue
-    if _queue is None:
-        _queue = Queue("images", connection=redis)
-    return _queue
+def get_queue(name: str = DEFAULT_QUEUE, redis: Optional[Redis] = None) -> Queue:
+    """Get the Redis Queue instance for ``name``."""
+    if name not in QUEUE_WEIGHTS:
+        raise ValueError(f"Unknown queue: {name!r}")
+    if name not in _queues:
+        _queues[name] = Queue(name, connection=redis or get_redis())
+    return _queues[name]
+
+def queue_depths(redis: Redis) -> Dict[str, Dict[str, int]]:
+    """Waiting, running and deferred job counts for each queue."""
+    depths = {}
+    for name in QUEUE_WEIGHTS:
+        queue = get_queue(name, redis)
+        depths[name] = {
+            "queued": queue.count,
+            "started": queue.started_job_registry.count,
+            "scheduled": queue.scheduled_job_registry.count,
+            "deferred": queue.deferred_job_registry.count,
+        }
+    return depths
 
 # Dependency functions for FastAPI
 def redis_dependency() -> Generator[Redis, None, None]:
@@ -35,6 +59,6 @@ def redis_dependency() -> Generator[Redis, None, None]:
         pass
 
 def queue_dependency(redis: Redis = Depends(redis_dependency)) -> Generator[Queue, None, None]:
-    """FastAPI dependency for Redis Queue."""
-    queue = get_queue(redis)
+    """FastAPI dependency for the default Redis Queue."""
+    queue = get_queue(DEFAULT_QUEUE, redis)
     yield queue
@@ -1,11 +1,23 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import Request
-from typing import Generator, Optional
+from typing import Any, Callable, Generator, Optional, TypeVar
 from supabase import create_client, Client
 
 from .config import settings
 
+T = TypeVar("T")
+
 _supabase: Optional[Client] = None
 
+# supabase-py is synchronous; queries issued from async code run here so a
+# slow round trip blocks a pool thread instead of the event loop. The bound
+# keeps a burst of requests from opening unbounded connections.
+_executor = ThreadPoolExecutor(
+    max_workers=settings.supabase_max_workers, thread_name_prefix="supabase"
+)
+
 
 def init_supabase() -> Client:
     return create_client(settings.supabase_url, settings.supabase_key)
@@ -19,6 +31,17 @@ def get_supabase() -> Client:
     return _supabase
 
 
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking Supabase call in the Supabase thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+async def aexecute(query):
+    """Execute a supabase-py query builder without blocking the event loop."""
+    return await run_blocking(query.execute)
+
+
 # Dependency functions for FastAPI
 def supabase_dependency(request: Request) -> Generator[Client, None, None]:
     """FastAPI dependency for Supabase client from lifespan state."""
@@ -0,0 +1,292 @@
+"""Per-user fair-share dispatch in front of the RQ job queues.
+
+RQ serves each queue FIFO, so one user's 100-video batch would hold every
+worker until it drains. Instead, submitted jobs are saved as ``created`` RQ
+jobs and parked in a per-user pending list. The dispatcher keeps only
+``settings.fair_ready_depth`` jobs in each RQ queue. It refills the queue by
+visiting users in round-robin order and skipping users who already have
+``settings.fair_user_max_running`` jobs dispatched or running.
+
+Dispatch happens on submit, when a job ends (RQ job callbacks), and
+periodically from ``fair_dispatch_daemon``. The daemon also reaps running
+entries whose job died without a callback.
+
+Redis keys, per RQ queue ``q`` and user ``u``::
+
+    bulks:fair:{q}:ring        list of users with pending jobs, next at the tail
+    bulks:fair:{q}:members     set mirror of the ring
+    bulks:fair:{q}:pending:{u} list of the user's waiting job ids, oldest first
+    bulks:fair:running:{u}     set of the user's dispatched or running job ids
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List, Tuple
+
+from fastapi import FastAPI
+from redis import Redis
+from rq import Callback, Queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job, JobStatus
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.redis import QUEUE_WEIGHTS, get_queue, get_redis
+
+PREFIX = "bulks:fair"
+DONE_STATUSES = {
+    JobStatus.FINISHED,
+    JobStatus.FAILED,
+    JobStatus.STOPPED,
+    JobStatus.CANCELED,
+}
+
+# Adds a user to the ring unless already present, then parks the job ids.
+# KEYS: ring, members, pending.  ARGV: user_id, job_id...
+_PARK = """
+if redis.call('SADD', KEYS[2], ARGV[1]) == 1 then
+    redis.call('LPUSH', KEYS[1], ARGV[1])
+end
+return redis.call('RPUSH', KEYS[3], unpack(ARGV, 2))
+"""
+
+# Visits each user in the ring once, rotating it, and claims the oldest
+# pending job of the first user under the running cap. Users whose pending
+# list is empty leave the ring.
+# KEYS: ring, members.  ARGV: pending key prefix, running key prefix, cap
+_CLAIM = """
+local n = redis.call('LLEN', KEYS[1])
+local cap = tonumber(ARGV[3])
+for i = 1, n do
+    local user = redis.call('RPOPLPUSH', KEYS[1], KEYS[1])
+    local pending = ARGV[1] .. user
+    local running = ARGV[2] .. user
+    if redis.call('LLEN', pending) == 0 then
+        redis.call('LREM', KEYS[1], 0, user)
+        redis.call('SREM', KEYS[2], user)
+    elseif cap <= 0 or redis.call('SCARD', running) < cap then
+        local job_id = redis.call('LPOP', pending)
+        redis.call('SADD', running, job_id)
+        if redis.call('LLEN', pending) == 0 then
+            redis.call('LREM', KEYS[1], 0, user)
+            redis.call('SREM', KEYS[2], user)
+        end
+        return {user, job_id}
+    end
+end
+return false
+"""
+
+# Undoes a claim whose enqueue failed: frees the running slot and puts the
+# job back at the head of the user's pending list.
+# KEYS: ring, members, pending, running.  ARGV: user_id, job_id
+_UNCLAIM = """
+redis.call('SREM', KEYS[4], ARGV[2])
+if redis.call('SADD', KEYS[2], ARGV[1]) == 1 then
+    redis.call('LPUSH', KEYS[1], ARGV[1])
+end
+return redis.call('LPUSH', KEYS[3], ARGV[2])
+"""
+
+
+def _ring_key(queue_name: str) -> str:
+    return f"{PREFIX}:{queue_name}:ring"
+
+
+def _members_key(queue_name: str) -> str:
+    return f"{PREFIX}:{queue_name}:members"
+
+
+def _pending_prefix(queue_name: str) -> str:
+    return f"{PREFIX}:{queue_name}:pending:"
+
+
+def _running_prefix() -> str:
+    return f"{PREFIX}:running:"
+
+
+def submit(queue: Queue, user_id: str, func, *args, **kwargs) -> Job:
+    """Create a job for ``user_id`` on ``queue`` and dispatch it when its turn comes."""
+
+    return submit_many(queue, user_id, [(func, args, kwargs)])[0]
+
+
+def submit_many(queue: Queue, user_id: str, calls: List[Tuple]) -> List[Job]:
+    """Create one job per ``(func, args, kwargs)`` in ``calls`` in a single round trip."""
+
+    pipe = queue.connection.pipeline()
+    jobs = []
+    for func, args, kwargs in calls:
+        job = queue.create_job(
+            func,
+            args=args,
+            kwargs=kwargs,
+            status=JobStatus.CREATED,
+            meta={"user_id": user_id},
+            on_success=Callback(on_job_success),
+            on_failure=Callback(on_job_failure),
+            on_stopped=Callback(on_job_stopped),
+        )
+        job.save(pipeline=pipe)
+        jobs.append(job)
+    pipe.eval(
+        _PARK,
+        3,
+        _ring_key(queue.name),
+        _members_key(queue.name),
+        _pending_prefix(queue.name) + user_id,
+        user_id,
+        *(job.id for job in jobs),
+    )
+    pipe.execute()
+    dispatch(queue)
+    return jobs
+
+
+def dispatch(queue: Queue) -> int:
+    """Move jobs from the per-user lists into ``queue`` until it is topped up."""
+
+    moved = 0
+    while queue.count < settings.fair_ready_depth:
+        claimed = queue.connection.eval(
+            _CLAIM,
+            2,
+            _ring_key(queue.name),
+            _members_key(queue.name),
+            _pending_prefix(queue.name),
+            _running_prefix(),
+            settings.fair_user_max_running,
+        )
+        if not claimed:
+            break
+        user_id, job_id = (value.decode() for value in claimed)
+        try:
+            queue.enqueue_job(Job.fetch(job_id, connection=queue.connection))
+            moved += 1
+        except NoSuchJobError:
+            queue.connection.srem(_running_prefix() + user_id, job_id)
+        except Exception:
+            logger.warning(f"Failed to dispatch job={job_id}; returning it to pending")
+            queue.connection.eval(
+                _UNCLAIM,
+                4,
+                _ring_key(queue.name),
+                _members_key(queue.name),
+                _pending_prefix(queue.name) + user_id,
+                _running_prefix() + user_id,
+                user_id,
+                job_id,
+            )
+            raise
+    return moved
+
+
+def release(connection: Redis, job: Job) -> None:
+    """Free ``job``'s running slot and refill its queue."""
+
+    user_id = job.meta.get("user_id")
+    if user_id:
+        connection.srem(_running_prefix() + user_id, job.id)
+    dispatch(Queue(job.origin, connection=connection))
+
+
+def on_job_success(job, connection, result, *args, **kwargs):
+    release(connection, job)
+
+
+def on_job_failure(job, connection, type, value, traceback):
+    release(connection, job)
+
+
+def on_job_stopped(job, connection):
+    release(connection, job)
+
+
+def reap_running(connection: Redis) -> int:
+    """Drop running entries whose job ended without a callback (e.g. a killed worker)."""
+
+    reaped = 0
+    for key in connection.scan_iter(match=_running_prefix() + "*"):
+        for raw in connection.smembers(key):
+            job_id = raw.decode()
+            try:
+                status = Job.fetch(job_id, connection=connection).get_status()
+            except NoSuchJobError:
+                status = None
+            if status is None or status in DONE_STATUSES:
+                connection.srem(key, job_id)
+                reaped += 1
+    return reaped
+
+
+def waiting_position(connection: Redis, job: Job) -> int | None:
+    """Estimated number of jobs that will start before a job still waiting its turn.
+
+    Round-robin serves one job per user per turn, so a job ``k`` places deep
+    in its user's list waits behind up to ``k + 1`` jobs from every other
+    waiting user, plus what is already in the RQ queue. Running caps are
+    ignored, so this overestimates while other users are capped out.
+    """
+
+    user_id = job.meta.get("user_id")
+    if not user_id:
+        return None
+    pending_prefix = _pending_prefix(job.origin)
+    mine = [raw.decode() for raw in connection.lrange(pending_prefix + user_id, 0, -1)]
+    if job.id not in mine:
+        return None
+    k = mine.index(job.id)
+    ahead = k + Queue(job.origin, connection=connection).count
+    for raw in connection.lrange(_ring_key(job.origin), 0, -1):
+        other = raw.decode()
+        if other != user_id:
+            ahead += min(connection.llen(pending_prefix + other), k + 1)
+    return ahead
+
+
+def _pending_jobs(connection: Redis, queue_name: str, users: List[bytes]) -> int:
+    pending_prefix = _pending_prefix(queue_name)
+    return sum(connection.llen(pending_prefix + user.decode()) for user in users)
+
+
+def backlog(queue: Queue) -> int:
+    """Jobs waiting to start on ``queue``: ready in RQ plus held back per user."""
+
+    users = queue.connection.lrange(_ring_key(queue.name), 0, -1)
+    return queue.count + _pending_jobs(queue.connection, queue.name, users)
+
+
+def pending_summary(connection: Redis) -> Dict[str, Dict[str, int]]:
+    """Waiting users and jobs held back by the dispatcher, per queue."""
+
+    summary = {}
+    for name in QUEUE_WEIGHTS:
+        users: List[bytes] = connection.lrange(_ring_key(name), 0, -1)
+        summary[name] = {
+            "users": len(users),
+            "pending": _pending_jobs(connection, name, users),
+        }
+    return summary
+
+
+async def fair_dispatch_daemon(app: FastAPI, stop_event: asyncio.Event) -> None:
+    interval = max(1, settings.fair_dispatch_interval_s)
+
+    def sweep() -> int:
+        connection = get_redis()
+        reap_running(connection)
+        return sum(dispatch(get_queue(name, connection)) for name in QUEUE_WEIGHTS)
+
+    while not stop_event.is_set():
+        try:
+            moved = await asyncio.to_thread(sweep)
+            if moved:
+                logger.info(f"fair dispatch: moved {moved} jobs")
+        except Exception:
+            logger.exception("Error while dispatching fair-share jobs")
+
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            continue
@@ -6,6 +6,11 @@ def sb_insert_job(job):
     sb.table("jobs").insert(job).execute()
 
 
+def sb_insert_jobs(jobs):
+    sb = get_supabase()
+    sb.table("jobs").insert(jobs).execute()
+
+
 def sb_update_job(jid, **fields):
     sb = get_supabase()
     sb.table("jobs").update(fields).eq("id", jid).execute()
@@ -0,0 +1,221 @@
+"""Warm RQ workers for bulks jobs.
+
+``rq worker`` imports the job module inside every forked work horse, so each
+job pays for importing litellm, moviepy and PIL and for reloading fonts,
+prompts and media listings. These workers do that once in a long-lived
+process:
+
+- ``WarmSimpleWorker`` runs jobs in the worker process itself (no fork).
+- ``WarmForkWorker`` keeps RQ's fork-per-job isolation, but forks from a
+  warmed parent so the children inherit the loaded state.
+
+Both log the fixed per-job overhead (wall time of a job minus the time spent
+in the job function) and stop after ``max_jobs`` jobs or once RSS exceeds
+``max_rss_mb``, so a process supervisor can start a fresh one.
+
+Queues are given as ``name`` or ``name:weight``. After every job the queue
+order is redrawn at random, with each queue's chance of going first
+proportional to its weight. Every backed-up queue then keeps a share of the
+worker, rather than the first listed queue taking all of it. With no queues
+given, the worker listens to all of ``QUEUE_WEIGHTS``.
+
+Run from ``backend/``::
+
+    python -m src.jobs.worker interactive:8 carousel:4 video:2 bulk:1 --max-jobs 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from redis import Redis
+from rq import Queue, SimpleWorker, Worker
+
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.core.redis import QUEUE_WEIGHTS
+
+
+def warm_up() -> float:
+    """Import job modules and preload fonts, prompts and media listings.
+
+    Returns the time taken in seconds. Each step that fails is logged and
+    skipped: a cold cache only costs time on the first job that needs it.
+    """
+
+    start = time.perf_counter()
+    for step in (_warm_fonts, _warm_media_index, _warm_job_modules):
+        try:
+            step()
+        except Exception:
+            logger.exception(f"worker warm-up step {step.__name__} failed")
+    return time.perf_counter() - start
+
+
+def _warm_fonts() -> None:
+    from src.lib.captioning.layout import PRESET_FONT_SIZES, _load_font
+
+    # Every size the caption autoscaler may try
+    for size in range(10, max(PRESET_FONT_SIZES.values()) + 1):
+        _load_font(settings.font_path, size)
+
+
+def _warm_media_index() -> None:
+    from src.workflow.utils import list_media
+
+    for library, suffix in (("scraped-image", ".jpg"), ("scraped-video", ".mp4")):
+        if not os.path.isdir(library):
+            continue
+        for category in sorted(os.listdir(library)):
+            path = os.path.abspath(os.path.join(library, category))
+            if os.path.isdir(path):
+                list_media(path, suffix)
+
+
+def _warm_job_modules() -> None:
+    # Job modules pull in litellm, moviepy and PIL; prompts are read once
+    import src.workflow.service as service
+
+    for style in sorted(os.listdir(os.path.join("prompts", "carousels"))):
+        service.get_carousel_prompt(style)
+    for style in sorted(os.listdir(os.path.join("prompts", "videos"))):
+        service.get_video_prompt(style)
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MiB."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        # ru_maxrss is the peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def parse_queue_weights(specs: List[str]) -> List[Tuple[str, float]]:
+    """Parse ``name`` / ``name:weight`` specs; a bare name takes its default weight."""
+
+    weighted = []
+    for spec in specs:
+        name, _, weight = spec.partition(":")
+        value = float(weight) if weight else float(QUEUE_WEIGHTS.get(name, 1))
+        if value <= 0:
+            raise ValueError(f"Queue weight must be positive: {spec!r}")
+        weighted.append((name, value))
+    return weighted
+
+
+def weighted_order(names: List[str], weights: Dict[str, float], rng=random) -> List[str]:
+    """Random order in which each name leads with probability proportional to its weight.
+
+    Weighted sampling without replacement: sort by ``u ** (1 / weight)``.
+    """
+
+    return sorted(names, key=lambda name: rng.random() ** (1.0 / weights[name]), reverse=True)
+
+
+class WarmWorkerMixin:
+    """Weighted queue order, per-job overhead reporting and memory-bounded recycling."""
+
+    max_rss_mb: float | None = None
+
+    def __init__(
+        self,
+        *args,
+        max_rss_mb: float | None = None,
+        queue_weights: Dict[str, float] | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.max_rss_mb = max_rss_mb
+        self.queue_weights = queue_weights or {}
+        self.overhead_jobs = 0
+        self.overhead_total_s = 0.0
+        if self.queue_weights:
+            self.reorder_queues(None)
+
+    def reorder_queues(self, reference_queue) -> None:
+        if not self.queue_weights:
+            return super().reorder_queues(reference_queue)
+        by_name = {queue.name: queue for queue in self.queues}
+        weights = {name: self.queue_weights.get(name, 1.0) for name in by_name}
+        self._ordered_queues = [by_name[name] for name in weighted_order(list(by_name), weights)]
+
+    def execute_job(self, job, queue) -> None:
+        start = time.perf_counter()
+        super().execute_job(job, queue)
+        wall = time.perf_counter() - start
+
+        if not (job.started_at and job.ended_at):
+            try:
+                job.refresh()  # fork mode: the work horse updated Redis, not us
+            except Exception:
+                pass
+        if job.started_at and job.ended_at:
+            overhead = max(0.0, wall - (job.ended_at - job.started_at).total_seconds())
+            self.overhead_jobs += 1
+            self.overhead_total_s += overhead
+            logger.info(
+                f"job={job.id} wall_ms={wall * 1000:.1f} overhead_ms={overhead * 1000:.1f} "
+                f"mean_overhead_ms={self.overhead_total_s / self.overhead_jobs * 1000:.1f}"
+            )
+
+        rss = current_rss_mb()
+        if self.max_rss_mb and rss > self.max_rss_mb:
+            logger.info(
+                f"worker {self.name}: rss {rss:.0f} MiB over {self.max_rss_mb:.0f} MiB, recycling"
+            )
+            self._stop_requested = True
+
+
+class WarmSimpleWorker(WarmWorkerMixin, SimpleWorker):
+    """Runs jobs in this long-lived, pre-warmed process."""
+
+
+class WarmForkWorker(WarmWorkerMixin, Worker):
+    """Forks each job from a pre-warmed parent."""
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run a warm bulks RQ worker.")
+    parser.add_argument(
+        "queues", nargs="*", help="name or name:weight (default: all job queues)"
+    )
+    parser.add_argument("--url", default=settings.redis_url)
+    parser.add_argument("--fork", action="store_true", help="fork per job from a warm parent")
+    parser.add_argument("--max-jobs", type=int, default=None, help="exit after this many jobs")
+    parser.add_argument("--max-rss-mb", type=float, default=None, help="exit once RSS exceeds this")
+    parser.add_argument("--with-scheduler", action="store_true")
+    parser.add_argument("--burst", action="store_true")
+    args = parser.parse_args(argv)
+
+    elapsed = warm_up()
+    logger.info(f"worker warm-up took {elapsed * 1000:.0f} ms, rss {current_rss_mb():.0f} MiB")
+
+    weighted = parse_queue_weights(args.queues or list(QUEUE_WEIGHTS))
+    connection = Redis.from_url(args.url)
+    worker_class = WarmForkWorker if args.fork else WarmSimpleWorker
+    worker = worker_class(
+        [Queue(name, connection=connection) for name, _ in weighted],
+        connection=connection,
+        max_rss_mb=args.max_rss_mb,
+        queue_weights=dict(weighted),
+    )
+    worker.work(
+        burst=args.burst,
+        max_jobs=args.max_jobs,
+        with_scheduler=args.with_scheduler,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Glyph atlas for composing caption text from cached glyph bitmaps."""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# (stroke mask, fill mask, left, top) with left/top relative to the pen
+# position on the baseline. Masks are uint8 coverage, as rendered by FreeType.
+Glyph = Tuple[np.ndarray, np.ndarray, int, int]
+
+
+class GlyphAtlas:
+    """Stroke and fill coverage masks for the glyphs of one font, size and stroke.
+
+    Colors are applied when a caption is composed, so one atlas serves every
+    text/stroke color combination rendered with the same font, size and
+    stroke width.
+    """
+
+    def __init__(self, font: ImageFont.FreeTypeFont, stroke_width: int) -> None:
+        self.font = font
+        self.stroke_width = stroke_width
+        self.ascent, _ = font.getmetrics()
+        self.glyphs: Dict[str, Glyph] = {}
+        self._advances: Dict[str, float] = {}
+        self._kerning: Dict[str, float] = {}
+
+    def has(self, text: str) -> bool:
+        return all(ch in self.glyphs for ch in text)
+
+    def add(self, text: Iterable[str]) -> None:
+        """Rasterize and store any glyphs of ``text`` not yet in the atlas."""
+
+        for ch in text:
+            if ch in self.glyphs:
+                continue
+            left, top, right, bottom = self.font.getbbox(
+                ch, stroke_width=self.stroke_width, anchor="ls"
+            )
+            width, height = max(0, right - left), max(0, bottom - top)
+            if not width or not height:
+                empty = np.zeros((0, 0), dtype=np.uint8)
+                self.glyphs[ch] = (empty, empty, 0, 0)
+                continue
+
+            stroke = Image.new("L", (width, height), 0)
+            ImageDraw.Draw(stroke).text(
+                (-left, -top),
+                ch,
+                font=self.font,
+                fill=255,
+                anchor="ls",
+                stroke_width=self.stroke_width,
+                stroke_fill=255,
+            )
+            fill = Image.new("L", (width, height), 0)
+            ImageDraw.Draw(fill).text(
+                (-left, -top), ch, font=self.font, fill=255, anchor="ls"
+            )
+            self.glyphs[ch] = (np.asarray(stroke), np.asarray(fill), left, top)
+
+    def pen_positions(self, line: str) -> List[float]:
+        """Return the kerned pen x offset of every character of ``line``."""
+
+        positions: List[float] = []
+        pen = 0.0
+        prev = ""
+        for ch in line:
+            if prev:
+                pen += self._kern(prev + ch)
+            positions.append(pen)
+            pen += self._advance(ch)
+            prev = ch
+        return positions
+
+    def blit_line(
+        self,
+        stroke_buf: np.ndarray,
+        fill_buf: np.ndarray,
+        line: str,
+        x: int,
+        y: int,
+    ) -> Tuple[int, int, int, int] | None:
+        """Merge ``line`` into the coverage buffers, top-left at ``(x, y)``.
+
+        ``(x, y)`` matches the ``ImageDraw.text`` default (left, ascender)
+        anchor. Overlapping glyph coverage is merged with ``max``, as FreeType
+        does within a rendered string. Returns the touched ``(x0, y0, x1, y1)``
+        box, or ``None`` if nothing was drawn.
+        """
+
+        buf_h, buf_w = fill_buf.shape
+        baseline = y + self.ascent
+        box: List[int] | None = None
+        for ch, pen in zip(line, self.pen_positions(line)):
+            stroke, fill, left, top = self.glyphs[ch]
+            if not fill.size:
+                continue
+            gx = x + int(round(pen)) + left
+            gy = baseline + top
+            x0, y0 = max(gx, 0), max(gy, 0)
+            x1 = min(gx + fill.shape[1], buf_w)
+            y1 = min(gy + fill.shape[0], buf_h)
+            if x1 <= x0 or y1 <= y0:
+                continue
+            src = (slice(y0 - gy, y1 - gy), slice(x0 - gx, x1 - gx))
+            dst = (slice(y0, y1), slice(x0, x1))
+            np.maximum(stroke_buf[dst], stroke[src], out=stroke_buf[dst])
+            np.maximum(fill_buf[dst], fill[src], out=fill_buf[dst])
+            if box is None:
+                box = [x0, y0, x1, y1]
+            else:
+                box = [min(box[0], x0), min(box[1], y0), max(box[2], x1), max(box[3], y1)]
+        return tuple(box) if box else None
+
+    def _advance(self, ch: str) -> float:
+        advance = self._advances.get(ch)
+        if advance is None:
+            advance = self._advances[ch] = self.font.getlength(ch)
+        return advance
+
+    def _kern(self, pair: str) -> float:
+        kern = self._kerning.get(pair)
+        if kern is None:
+            kern = self._kerning[pair] = (
+                self.font.getlength(pair)
+                - self._advance(pair[0])
+                - self._advance(pair[1])
+            )
+        return kern
+
+
+@lru_cache(maxsize=32)
+def get_glyph_atlas(font: ImageFont.FreeTypeFont, stroke_width: int) -> GlyphAtlas:
+    """Return the shared atlas for ``font`` (a cached ``_load_font`` result)."""
+
+    return GlyphAtlas(font, stroke_width)
+
+
+def paste_coverage(
+    image: Image.Image,
+    stroke_buf: np.ndarray,
+    fill_buf: np.ndarray,
+    box: Tuple[int, int, int, int],
+    text_color: Tuple[int, int, int],
+    stroke_color: Tuple[int, int, int],
+) -> None:
+    """Paint the stroke, then the fill, through their coverage masks.
+
+    This is the same masked paste ``ImageDraw.text`` performs with the
+    FreeType bitmap, restricted to ``box``.
+    """
+
+    x0, y0, x1, y1 = box
+    region = (slice(y0, y1), slice(x0, x1))
+    stroke_mask = Image.fromarray(np.ascontiguousarray(stroke_buf[region]))
+    fill_mask = Image.fromarray(np.ascontiguousarray(fill_buf[region]))
+    image.paste(tuple(stroke_color) + (255,), (x0, y0, x1, y1), stroke_mask)
+    image.paste(tuple(text_color) + (255,), (x0, y0, x1, y1), fill_mask)
@@ -1,7 +1,76 @@
 """ffmpeg command builders for caption overlays."""
 from __future__ import annotations
 
-from typing import Dict, List
+from typing import Dict, List, Sequence, Tuple
+
+# Named libx264 encode settings, picked per job. "gop" is the keyframe
+# interval in frames, "maxrate"/"bufsize" the VBV cap (None for pure CRF),
+# "threads" 0 lets x264 decide.
+ENCODING_PROFILES: Dict[str, Dict[str, object]] = {
+    # Fast previews and test runs: lowest latency, larger files. Capped
+    # because ultrafast CRF on high-motion footage ran to ~145 Mbit/s
+    "draft": {
+        "preset": "ultrafast",
+        "tune": "fastdecode",
+        "crf": 30,
+        "gop": 60,
+        "maxrate": "8M",
+        "bufsize": "8M",
+        "threads": 0,
+        "audio_bitrate": "96k",
+        "faststart": True,
+    },
+    # Publish-ready for TikTok/Reels: 2s GOP at 30fps and a bitrate cap
+    # below what the platforms re-encode anyway
+    "tiktok": {
+        "preset": "fast",
+        "tune": "film",
+        "crf": 23,
+        "gop": 60,
+        "maxrate": "6M",
+        "bufsize": "12M",
+        "threads": 0,
+        "audio_bitrate": "128k",
+        "faststart": True,
+    },
+    # Masters kept for re-use: slow preset, high quality. The cap sits far
+    # above what real footage needs at CRF 18 and only bounds noise-like
+    # input, which ran to ~250 Mbit/s uncapped
+    "archive": {
+        "preset": "slow",
+        "tune": "film",
+        "crf": 18,
+        "gop": 250,
+        "maxrate": "40M",
+        "bufsize": "80M",
+        "threads": 0,
+        "audio_bitrate": "192k",
+        "faststart": True,
+    },
+    # Low-res preview rendition written next to the main output
+    "preview": {
+        "preset": "veryfast",
+        "tune": "fastdecode",
+        "crf": 30,
+        "gop": 60,
+        "maxrate": "600k",
+        "bufsize": "1200k",
+        "threads": 0,
+        "audio_bitrate": "64k",
+        "faststart": True,
+    },
+}
+
+# ffmpeg encoder arguments per still-image output format. "jpeg" uses full
+# range 4:2:0 with optimal Huffman tables; ffmpeg's mjpeg encoder has no
+# progressive mode.
+IMAGE_FORMAT_ARGS: Dict[str, List[str]] = {
+    "jpeg": ["-c:v", "mjpeg", "-q:v", "3", "-pix_fmt", "yuvj420p", "-huffman", "optimal"],
+    "webp": ["-c:v", "libwebp", "-quality", "80", "-compression_level", "4"],
+}
+
+# Height of the preview rendition; width follows the aspect ratio
+PREVIEW_HEIGHT = 640
 
 
 def build_ffmpeg_image_cmd(
@@ -12,8 +81,20 @@ def build_ffmpeg_image_cmd(
     canvas_h: int,
     caption_png: str,
     caption_box: Dict[str, int],
+    image_format: str | None = None,
 ) -> List[str]:
-    """Construct the ffmpeg command for captioning an image."""
+    """Construct the ffmpeg command for captioning an image.
+
+    ``image_format`` selects tuned encoder settings from
+    ``IMAGE_FORMAT_ARGS``; ``None`` leaves the choice to ffmpeg's defaults
+    for the ``out_path`` extension.
+    """
+
+    if image_format is not None and image_format not in IMAGE_FORMAT_ARGS:
+        raise ValueError(
+            f"Unknown image format {image_format!r}; "
+            f"expected one of {sorted(IMAGE_FORMAT_ARGS)}"
+        )
 
     overlay_x = caption_box["x"]
     overlay_y = caption_box["y"]
@@ -38,6 +119,7 @@ def build_ffmpeg_image_cmd(
         filter_complex,
         "-frames:v",
         "1",
+        *IMAGE_FORMAT_ARGS.get(image_format, []),
         out_path,
     ]
 
@@ -54,8 +136,21 @@ def build_ffmpeg_video_cmd(
     preset: str = "medium",
     hw_accel: str | None = None,
     audio_copy: bool = False,
+    start: float | None = None,
+    duration: float | None = None,
+    profile: str | None = None,
+    poster_path: str | None = None,
+    preview_path: str | None = None,
 ) -> List[str]:
-    """Construct the ffmpeg command for captioning a video."""
+    """Construct the ffmpeg command for captioning a video.
+
+    ``start``/``duration`` trim the source with input options, so ffmpeg
+    seeks before decoding and stops reading after ``duration`` seconds.
+    ``profile`` names an entry of ``ENCODING_PROFILES``; its CRF and preset
+    replace ``crf``/``preset`` (the preset only for software encoding).
+    ``poster_path`` (JPEG or WebP) and ``preview_path`` (low-res MP4) add
+    extra outputs fed from the same decoded, captioned frames.
+    """
 
     overlay_x = caption_box["x"]
     overlay_y = caption_box["y"]
@@ -65,6 +160,11 @@ def build_ffmpeg_video_cmd(
         f"[1:v]format=rgba,scale=flags=lanczos[overlay];"
         f"[base][overlay]overlay={overlay_x}:{overlay_y}:format=auto"
     )
+    rendition_filters, rendition_args, main_label = _rendition_outputs(
+        "v", poster_path, preview_path
+    )
+    if rendition_filters:
+        filter_complex = ";".join([filter_complex + "[v]", *rendition_filters])
 
     # Base command
     cmd = [
@@ -73,51 +173,205 @@ def build_ffmpeg_video_cmd(
         "-y",
         "-v",
         "error",
+        *_trim_args(start, duration),
         "-i",
         src_url,
         "-i",
         caption_png,
         "-filter_complex",
         filter_complex,
-        "-map",
-        "0:a?",
     ]
-    
+    if main_label:
+        cmd.extend(["-map", main_label])
+    cmd.extend(["-map", "0:a?"])
+    cmd.extend(_video_encode_args(crf, preset, hw_accel, audio_copy, profile))
+    cmd.append(out_path)
+    cmd.extend(rendition_args)
+
+    return cmd
+
+
+def build_ffmpeg_video_multi_cmd(
+    src_url: str,
+    outputs: Sequence[Tuple[str, str, Dict[str, int]]],
+    *,
+    canvas_w: int,
+    canvas_h: int,
+    crf: int = 18,
+    preset: str = "medium",
+    hw_accel: str | None = None,
+    audio_copy: bool = False,
+    start: float | None = None,
+    duration: float | None = None,
+    profile: str | None = None,
+    poster_paths: Sequence[str | None] | None = None,
+    preview_paths: Sequence[str | None] | None = None,
+) -> List[str]:
+    """Construct one ffmpeg command captioning a video into several outputs.
+
+    ``outputs`` holds ``(out_path, caption_png, caption_box)`` per output. The
+    source is decoded, scaled and padded once, then ``split`` into one overlay
+    branch per caption, each mapped to its own encoded output. ``start``,
+    ``duration`` and ``profile`` behave as in ``build_ffmpeg_video_cmd``;
+    ``poster_paths``/``preview_paths`` give each output's optional poster and
+    preview, aligned with ``outputs``.
+    """
+
+    if not outputs:
+        raise ValueError("outputs must not be empty")
+
+    count = len(outputs)
+    poster_paths = list(poster_paths or [None] * count)
+    preview_paths = list(preview_paths or [None] * count)
+    if len(poster_paths) != count or len(preview_paths) != count:
+        raise ValueError("poster_paths and preview_paths must match outputs")
+    bases = "".join(f"[base{i}]" for i in range(count))
+    filters = [
+        f"[0:v]scale=w={canvas_w}:h={canvas_h}:force_original_aspect_ratio=decrease:flags=lanczos"
+        f",pad={canvas_w}:{canvas_h}:(ow-iw)/2:(oh-ih)/2:black,split={count}{bases}"
+    ]
+    output_labels = []
+    output_renditions = []
+    for i, (_, _, caption_box) in enumerate(outputs):
+        filters.append(f"[{i + 1}:v]format=rgba,scale=flags=lanczos[overlay{i}]")
+        filters.append(
+            f"[base{i}][overlay{i}]overlay={caption_box['x']}:{caption_box['y']}"
+            f":format=auto[v{i}]"
+        )
+        rendition_filters, rendition_args, main_label = _rendition_outputs(
+            f"v{i}", poster_paths[i], preview_paths[i]
+        )
+        filters.extend(rendition_filters)
+        output_labels.append(main_label or f"[v{i}]")
+        output_renditions.append(rendition_args)
+
+    cmd = ["ffmpeg", "-nostdin", "-y", "-v", "error", *_trim_args(start, duration)]
+    cmd.extend(["-i", src_url])
+    for _, caption_png, _ in outputs:
+        cmd.extend(["-i", caption_png])
+    cmd.extend(["-filter_complex", ";".join(filters)])
+
+    encode_args = _video_encode_args(crf, preset, hw_accel, audio_copy, profile)
+    for i, (out_path, _, _) in enumerate(outputs):
+        cmd.extend(["-map", output_labels[i], "-map", "0:a?"])
+        cmd.extend(encode_args)
+        cmd.append(out_path)
+        cmd.extend(output_renditions[i])
+
+    return cmd
+
+
+def _rendition_outputs(
+    label: str, poster_path: str | None, preview_path: str | None
+) -> Tuple[List[str], List[str], str | None]:
+    """Split the ``[label]`` stream into the main output, a poster and a preview.
+
+    Returns the extra filter chains, the output arguments for the renditions
+    and the label the main output must map (``None`` when there are no
+    renditions and ``[label]`` is used as is).
+    """
+
+    branches = [f"[{label}main]"]
+    if poster_path:
+        branches.append(f"[{label}poster]")
+    if preview_path:
+        branches.append(f"[{label}prevsrc]")
+    if len(branches) == 1:
+        return [], [], None
+
+    filters = [f"[{label}]split={len(branches)}{''.join(branches)}"]
+    args: List[str] = []
+    if poster_path:
+        args.extend(["-map", f"[{label}poster]", "-frames:v", "1"])
+        if poster_path.lower().endswith(".webp"):
+            args.extend(["-c:v", "libwebp", "-quality", "80"])
+        else:
+            args.extend(["-q:v", "3"])
+        args.append(poster_path)
+    if preview_path:
+        filters.append(
+            f"[{label}prevsrc]scale=w=-2:h={PREVIEW_HEIGHT}:flags=bilinear[{label}preview]"
+        )
+        args.extend(["-map", f"[{label}preview]", "-map", "0:a?"])
+        args.extend(_video_encode_args(0, "veryfast", None, False, "preview"))
+        args.append(preview_path)
+    return filters, args, f"[{label}main]"
+
+
+def _trim_args(start: float | None, duration: float | None) -> List[str]:
+    """Input seek/duration options; they must precede the source ``-i``."""
+
+    args: List[str] = []
+    if start:
+        args.extend(["-ss", f"{start:.3f}"])
+    if duration is not None:
+        args.extend(["-t", f"{duration:.3f}"])
+    return args
+
+
+def _video_encode_args(
+    crf: int,
+    preset: str,
+    hw_accel: str | None,
+    audio_copy: bool,
+    profile: str | None = None,
+) -> List[str]:
+    """Video/audio codec and pixel format arguments for one output."""
+
+    encoding: Dict[str, object] = {}
+    if profile is not None:
+        if profile not in ENCODING_PROFILES:
+            raise ValueError(
+                f"Unknown encoding profile {profile!r}; "
+                f"expected one of {sorted(ENCODING_PROFILES)}"
+            )
+        encoding = ENCODING_PROFILES[profile]
+        crf = int(encoding["crf"])
+
     # Select video encoder based on hardware acceleration
     if hw_accel == "nvenc":
-        cmd.extend([
+        args = [
             "-c:v", "h264_nvenc",
             "-preset", preset,  # NVENC presets: slow/medium/fast/hp/hq/bd/ll/llhq/llhp
             "-cq", str(crf),  # Use CQ (constant quality) instead of CRF for NVENC
-        ])
+        ]
     elif hw_accel == "qsv":
-        cmd.extend([
+        args = [
             "-c:v", "h264_qsv",
             "-preset", preset,
             "-global_quality", str(crf),  # QSV uses global_quality
-        ])
+        ]
     elif hw_accel == "vaapi":
-        cmd.extend([
+        args = [
             "-c:v", "h264_vaapi",
             "-qp", str(crf),  # VAAPI uses qp
-        ])
+        ]
     else:
         # Software encoding (default)
-        cmd.extend([
+        args = [
             "-c:v", "libx264",
-            "-preset", preset,
+            "-preset", str(encoding.get("preset", preset)),
             "-crf", str(crf),
-        ])
-    
+        ]
+        if encoding.get("tune"):
+            args.extend(["-tune", str(encoding["tune"])])
+
+    if encoding.get("gop"):
+        args.extend(["-g", str(encoding["gop"])])
+    if encoding.get("maxrate"):
+        args.extend(["-maxrate", str(encoding["maxrate"])])
+        args.extend(["-bufsize", str(encoding["bufsize"])])
+    if encoding.get("threads") is not None:
+        args.extend(["-threads", str(encoding["threads"])])
+
     # Audio and pixel format
     if audio_copy:
-        cmd.extend(["-c:a", "copy"])
+        args.extend(["-c:a", "copy"])
     else:
-        cmd.extend(["-c:a", "aac", "-b:a", "128k"])
+        audio_bitrate = encoding.get("audio_bitrate", "128k")
+        args.extend(["-c:a", "aac", "-b:a", str(audio_bitrate)])
 
-    cmd.extend([
-        "-pix_fmt", "yuv420p",
-        out_path,
-    ])
-    
-    return cmd
+    args.extend(["-pix_fmt", "yuv420p"])
+    if encoding.get("faststart"):
+        args.extend(["-movflags", "+faststart"])
+    return args
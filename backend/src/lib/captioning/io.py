@@ -6,18 +6,25 @@ import shutil
 import subprocess
 import tempfile
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 
 import requests
 
+from ..scratch import scratch_dir
+
 
 def download_to_temp(source: str) -> str:
-    """Download a URL or copy a local file to a temporary path."""
+    """Download a URL or copy a local file to a temporary path.
+
+    The copy goes to the current job's scratch directory when there is one.
+    """
 
     path = Path(source)
     if path.exists():
         suffix = path.suffix
-        tmp = tempfile.NamedTemporaryFile("wb", suffix=suffix, delete=False)
+        tmp = tempfile.NamedTemporaryFile(
+            "wb", suffix=suffix, delete=False, dir=scratch_dir(path.stat().st_size)
+        )
         with tmp, path.open("rb") as src:
             shutil.copyfileobj(src, tmp)
         return tmp.name
@@ -34,7 +41,10 @@ def download_to_temp(source: str) -> str:
             )
 
         suffix = Path(Path(source).name).suffix or ""
-        tmp = tempfile.NamedTemporaryFile("wb", suffix=suffix, delete=False)
+        size_hint = int(response.headers.get("Content-Length") or 0) or None
+        tmp = tempfile.NamedTemporaryFile(
+            "wb", suffix=suffix, delete=False, dir=scratch_dir(size_hint)
+        )
         with tmp:
             for chunk in response.iter_content(chunk_size=64 * 1024):
                 if chunk:
@@ -72,3 +82,45 @@ def ffprobe_json(src_url: str) -> Dict[str, object]:
         return json.loads(completed.stdout or "{}")
     except json.JSONDecodeError as exc:  # pragma: no cover - unexpected ffprobe output
         raise ValueError("ffprobe produced invalid JSON") from exc
+
+
+def ffprobe_keyframes(src_url: str) -> List[float]:
+    """Return the sorted presentation times (seconds) of the video keyframes.
+
+    Reads packet flags only, so the stream is demuxed but not decoded.
+    """
+
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "packet=pts_time,flags",
+        "-print_format",
+        "json",
+        src_url,
+    ]
+    try:
+        completed = subprocess.run(
+            cmd,
+            check=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            close_fds=True,
+        )
+    except subprocess.CalledProcessError as exc:
+        stderr = exc.stderr[-500:]
+        raise RuntimeError(f"ffprobe failed: {stderr}") from exc
+    try:
+        packets = json.loads(completed.stdout or "{}").get("packets", [])
+    except json.JSONDecodeError as exc:  # pragma: no cover - unexpected ffprobe output
+        raise ValueError("ffprobe produced invalid JSON") from exc
+    return sorted(
+        float(packet["pts_time"])
+        for packet in packets
+        if "K" in packet.get("flags", "") and packet.get("pts_time") not in (None, "N/A")
+    )
@@ -3,10 +3,18 @@
 from __future__ import annotations
 
 import tempfile
-from typing import Dict, List, Tuple
+import weakref
+from collections import deque
+from functools import lru_cache
+from typing import Deque, Dict, List, Tuple
 
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
+from ..scratch import scratch_dir
+from .atlas import get_glyph_atlas, paste_coverage
+from .masks import rounded_rects_mask
+
 
 PRESET_FONT_SIZES = {
     "big": 96,
@@ -56,6 +64,7 @@ def compute_layout(
     }
 
 
+@lru_cache(maxsize=128)
 def _load_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
     try:
         return ImageFont.truetype(font_path, size)
@@ -63,25 +72,74 @@ def _load_font(font_path: str, size: int) -> ImageFont.FreeTypeFont:
         raise FileNotFoundError(f"Unable to load font at {font_path!r}: {exc}") from exc
 
 
+# Per-font advance widths of words, characters and the space, keyed by font.
+# Fonts stay alive in _load_font's cache, so each table is emptied once it
+# holds _WORD_WIDTHS_MAX entries rather than growing with every new word.
+_WORD_WIDTHS_MAX = 4096
+_WORD_WIDTHS: weakref.WeakKeyDictionary[ImageFont.FreeTypeFont, Dict[str, float]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _word_width_cache(font: ImageFont.FreeTypeFont) -> Dict[str, float]:
+    cache = _WORD_WIDTHS.get(font)
+    if cache is None:
+        cache = _WORD_WIDTHS[font] = {}
+    elif len(cache) >= _WORD_WIDTHS_MAX:
+        cache.clear()
+    return cache
+
+
 def _wrap_text_to_width(
     text: str, font: ImageFont.FreeTypeFont, max_width: int
 ) -> List[str]:
+    """Greedily wrap ``text`` so every line fits within ``max_width`` pixels.
+
+    Words, characters and the space are measured once per font with
+    ``getlength`` and cached, and lines are fitted by summing advances. Only
+    the final lines (and candidates within ``slack`` of the limit) are
+    measured as a whole with ``getbbox`` to correct for kerning and side
+    bearings.
+    """
+
+    widths = _word_width_cache(font)
+    # Side bearings/kerning never move a line by more than a fraction of the em
+    slack = max(2.0, font.size * 0.25)
+
+    def advance(text_value: str) -> float:
+        width = widths.get(text_value)
+        if width is None:
+            width = widths[text_value] = font.getlength(text_value)
+        return width
+
     def measure(text_value: str) -> int:
         bbox = font.getbbox(text_value if text_value else " ")
         return bbox[2] - bbox[0]
 
+    def fits(text_value: str, estimate: float) -> bool:
+        if estimate <= max_width - slack:
+            return True
+        if estimate > max_width + slack:
+            return False
+        return measure(text_value) <= max_width
+
+    space = advance(" ")
+
     def split_word(word: str) -> List[str]:
-        if measure(word) <= max_width or len(word) == 1:
+        if len(word) == 1 or fits(word, advance(word)):
             return [word]
         parts: List[str] = []
         current = ""
+        current_w = 0.0
         for ch in word:
-            trial = current + ch
-            if measure(trial) <= max_width or not current:
-                current = trial
+            ch_w = advance(ch)
+            if not current or fits(current + ch, current_w + ch_w):
+                current += ch
+                current_w += ch_w
             else:
                 parts.append(current)
                 current = ch
+                current_w = ch_w
         if current:
             parts.append(current)
         return parts
@@ -91,21 +149,43 @@ def _wrap_text_to_width(
         if not words:
             return [""]
 
-        wrapped: List[str] = []
-        current = ""
+        # (segment, joins_with_space) in reading order
+        pieces: Deque[Tuple[str, bool]] = deque()
         for word in words:
-            segments = split_word(word)
-            for seg_index, segment in enumerate(segments):
-                prefix = " " if (current and seg_index == 0) else ""
-                candidate = current + prefix + segment if current else segment
-                if candidate and measure(candidate) <= max_width:
-                    current = candidate
-                else:
-                    if current:
-                        wrapped.append(current)
-                    current = segment
+            for seg_index, segment in enumerate(split_word(word)):
+                pieces.append((segment, seg_index == 0))
+
+        wrapped: List[str] = []
+        current: List[Tuple[str, bool]] = []
+        current_text = ""
+        current_w = 0.0
+
+        def flush() -> None:
+            nonlocal current, current_text, current_w
+            # Kerning correction: push trailing pieces back if the line overflows
+            while len(current) > 1 and measure(current_text) > max_width:
+                pieces.appendleft(current.pop())
+                current_text = _join_pieces(current)
+            wrapped.append(current_text)
+            current, current_text, current_w = [], "", 0.0
+
+        while pieces:
+            segment, spaced = pieces.popleft()
+            seg_w = advance(segment)
+            if not current:
+                current, current_text, current_w = [(segment, spaced)], segment, seg_w
+                continue
+            gap = space if spaced else 0.0
+            candidate = current_text + (" " if spaced else "") + segment
+            if fits(candidate, current_w + gap + seg_w):
+                current.append((segment, spaced))
+                current_text = candidate
+                current_w += gap + seg_w
+            else:
+                pieces.appendleft((segment, spaced))
+                flush()
         if current:
-            wrapped.append(current)
+            flush()
         return wrapped
 
     if not text:
@@ -119,6 +199,13 @@ def _wrap_text_to_width(
     return lines
 
 
+def _join_pieces(pieces: List[Tuple[str, bool]]) -> str:
+    text = ""
+    for index, (segment, spaced) in enumerate(pieces):
+        text += (" " if spaced and index else "") + segment
+    return text
+
+
 def wrap_and_autoscale_text(
     caption: str,
     font_path: str,
@@ -192,8 +279,63 @@ def render_caption_png(
     align: str = "center",
     debug: bool = False,
     background_line_gap_px: int = 0,
+    text_renderer: str = "pil",
 ) -> str:
-    """Render the caption text to a temporary PNG file."""
+    """Render the caption text to a temporary PNG file.
+
+    See :func:`render_caption_image` for the parameters.
+    """
+
+    image = render_caption_image(
+        caption_layout,
+        font_path,
+        box,
+        text_color=text_color,
+        stroke_color=stroke_color,
+        stroke_width_px=stroke_width_px,
+        background=background,
+        background_opacity=background_opacity,
+        background_color=background_color,
+        background_style=background_style,
+        background_padding_px=background_padding_px,
+        align=align,
+        debug=debug,
+        background_line_gap_px=background_line_gap_px,
+        text_renderer=text_renderer,
+    )
+    tmp = tempfile.NamedTemporaryFile(
+        "wb", suffix=".png", delete=False, dir=scratch_dir(image.width * image.height)
+    )
+    with tmp:
+        image.save(tmp, format="PNG", compress_level=1, optimize=False)
+    return tmp.name
+
+
+def render_caption_image(
+    caption_layout: Dict[str, object],
+    font_path: str,
+    box: Dict[str, int],
+    *,
+    text_color: Tuple[int, int, int] = (255, 255, 255),
+    stroke_color: Tuple[int, int, int] = (0, 0, 0),
+    stroke_width_px: int = 2,
+    background: str | None = "semi",
+    background_opacity: float = 0.65,
+    background_color: Tuple[int, int, int] | None = None,
+    background_style: str = "box",
+    background_padding_px: int = 20,
+    align: str = "center",
+    debug: bool = False,
+    background_line_gap_px: int = 0,
+    text_renderer: str = "pil",
+) -> Image.Image:
+    """Render the caption text to an RGBA image the size of ``box``.
+
+    ``text_renderer="atlas"`` composes lines from cached glyph bitmaps (see
+    :mod:`.atlas`) instead of rasterizing them through ``ImageDraw.text``.
+    Lines containing glyphs the atlas has not seen yet are drawn with
+    ``ImageDraw.text`` and their glyphs are added for later captions.
+    """
 
     if stroke_width_px < 0:
         raise ValueError("stroke_width_px must be >= 0")
@@ -217,6 +359,11 @@ def render_caption_png(
     if background_line_gap_px < 0:
         raise ValueError("background_line_gap_px must be >= 0")
 
+    if text_renderer not in {"pil", "atlas"}:
+        raise ValueError(
+            f"text_renderer must be 'pil' or 'atlas', got {text_renderer!r}"
+        )
+
     font_size = int(caption_layout["font_size_px"])
     lines = caption_layout["lines"]
     line_height = int(caption_layout["line_height_px"])
@@ -252,6 +399,13 @@ def render_caption_png(
 
     draw = ImageDraw.Draw(image)
 
+    atlas = None
+    text_box: List[int] | None = None
+    if text_renderer == "atlas":
+        atlas = get_glyph_atlas(font, stroke_width_px)
+        stroke_buf = np.zeros((h, w), dtype=np.uint8)
+        fill_buf = np.zeros((h, w), dtype=np.uint8)
+
     # Calculate starting y position
     y = max(0, (h - total_height) // 2)
 
@@ -264,6 +418,10 @@ def render_caption_png(
             f"font_size={font_size} line_height={line_height} spacing_px={spacing_px} total_height={total_height}"
         )
 
+    placements: List[Tuple[str, int, int]] = []
+    bg_rects: List[Tuple[int, int, int, int]] = []
+    corner_radius = min(10, background_padding_px // 2)
+
     for idx, line in enumerate(lines):
         text = line
         bbox = font.getbbox(text if text else " ")
@@ -280,7 +438,9 @@ def render_caption_png(
         else:
             raise ValueError(f"Unsupported alignment: {align!r}")
 
-        # Draw per-line background if needed
+        placements.append((text, x, y))
+
+        # Per-line background extents, if needed
         if background_style == "line" and background is not None:
             # Horizontal extents from text width with padding
             bg_x1 = max(0, x - background_padding_px)
@@ -299,11 +459,7 @@ def render_caption_png(
             bg_y1 = max(0, y - vertical_pad + shrink)
             bg_y2 = min(h, y + line_height + vertical_pad - shrink)
 
-            # Draw rounded rectangle for TikTok-style background
-            corner_radius = min(10, background_padding_px // 2)
-            draw.rounded_rectangle(
-                [(bg_x1, bg_y1), (bg_x2, bg_y2)], radius=corner_radius, fill=bg_rgba
-            )
+            bg_rects.append((bg_x1, bg_y1, bg_x2, bg_y2))
 
             if debug:
                 bg_cx = (bg_x1 + bg_x2) / 2.0
@@ -314,21 +470,48 @@ def render_caption_png(
                     f"line[{idx}] '{text}': bbox={bbox} text_w={text_width} line_y={y} x={x} -> bg=({bg_x1},{bg_y1},{bg_x2},{bg_y2}) cx_diff={text_cx-bg_cx:.2f} cy_diff={text_cy-bg_cy:.2f} base_gap={base_gap} shrink={shrink}"
                 )
 
-        # Draw text on top of background
-        draw.text(
-            (x, y),
-            text,
-            fill=tuple(int(c) for c in text_color) + (255,),
-            font=font,
-            stroke_width=stroke_width_px,
-            stroke_fill=tuple(int(c) for c in stroke_color) + (255,),
-        )
-
         y += line_height
         if idx < len(lines) - 1:
             y += spacing_px
 
-    tmp = tempfile.NamedTemporaryFile("wb", suffix=".png", delete=False)
-    with tmp:
-        image.save(tmp, format="PNG", compress_level=1, optimize=False)
-    return tmp.name
+    # Rounded TikTok-style line backgrounds, applied as one mask
+    if bg_rects:
+        bg_mask = rounded_rects_mask((w, h), bg_rects, corner_radius)
+        image.paste(Image.new("RGBA", (w, h), bg_rgba), (0, 0), Image.fromarray(bg_mask))
+
+    # Draw text on top of background
+    for text, x, y in placements:
+        if atlas is not None and atlas.has(text):
+            line_box = atlas.blit_line(stroke_buf, fill_buf, text, x, y)
+            if line_box and text_box is None:
+                text_box = list(line_box)
+            elif line_box:
+                text_box = [
+                    min(text_box[0], line_box[0]),
+                    min(text_box[1], line_box[1]),
+                    max(text_box[2], line_box[2]),
+                    max(text_box[3], line_box[3]),
+                ]
+        else:
+            draw.text(
+                (x, y),
+                text,
+                fill=tuple(int(c) for c in text_color) + (255,),
+                font=font,
+                stroke_width=stroke_width_px,
+                stroke_fill=tuple(int(c) for c in stroke_color) + (255,),
+            )
+            if atlas is not None:
+                atlas.add(text)
+
+    if text_box is not None:
+        paste_coverage(
+            image,
+            stroke_buf,
+            fill_buf,
+            tuple(text_box),
+            tuple(int(c) for c in text_color),
+            tuple(int(c) for c in stroke_color),
+        )
+
+    return image
@@ -0,0 +1,99 @@
+"""Vectorized alpha masks for caption backgrounds."""
+
+from __future__ import annotations
+
+from typing import Sequence, Tuple
+
+import numpy as np
+
+
+def rounded_rects_mask(
+    size: Tuple[int, int],
+    rects: Sequence[Tuple[int, int, int, int]],
+    radii: Sequence[int] | int,
+    *,
+    connect: bool = False,
+    value: int = 255,
+) -> np.ndarray:
+    """Return a uint8 mask set to ``value`` inside rounded rectangles, 0 elsewhere.
+
+    ``rects`` are inclusive ``(x0, y0, x1, y1)`` boxes, as accepted by
+    ``ImageDraw.rounded_rectangle``; ``radii`` is one corner radius per rect or
+    a single radius for all. With ``connect=True`` each rect is also joined to
+    the next by a trapezoid from the bottom edge of the former to the top
+    edge of the latter.
+
+    Every shape is reduced to a per-row ``[left, right)`` span, computed for all
+    shapes and rows at once, and the mask is written as the run-length union
+    of those spans.
+    """
+
+    width, height = size
+    mask = np.zeros((height, width), dtype=np.uint8)
+    if not rects or width <= 0 or height <= 0:
+        return mask
+
+    boxes = np.asarray(rects, dtype=np.float64).reshape(-1, 4)
+    x0, y0, x1, y1 = (boxes[:, i : i + 1] for i in range(4))
+    r = np.broadcast_to(np.asarray(radii, dtype=np.float64), (len(boxes),))[:, None]
+    r = np.minimum(r, np.minimum(x1 - x0, y1 - y0) / 2).clip(min=0)
+
+    top, bottom = int(max(0, y0.min())), int(min(height - 1, y1.max()))
+    if connect and len(boxes) > 1:
+        top = int(max(0, min(top, y1[:-1].min())))
+        bottom = int(min(height - 1, max(bottom, y0[1:].max())))
+    if bottom < top:
+        return mask
+    # Pixel-center y of every row the shapes can touch
+    rows = np.arange(top, bottom + 1, dtype=np.float64)[None, :] + 0.5
+
+    # Rounded rects: the corner arcs pull the span in near the top and bottom
+    dy = np.maximum(np.maximum(y0 + r - rows, rows - (y1 + 1 - r)), 0)
+    inset = r - np.sqrt(np.maximum(r * r - dy * dy, 0))
+    inside = (rows >= y0) & (rows <= y1 + 1)
+    lefts = [np.where(inside, x0 + inset, np.inf)]
+    rights = [np.where(inside, x1 + 1 - inset, -np.inf)]
+
+    if connect and len(boxes) > 1:
+        # Trapezoid from (prev bottom edge) to (next top edge); may run upward.
+        # Like ImageDraw.polygon, both edge rows are included.
+        ya, yb = y1[:-1] + 1, y0[1:]
+        span = np.where(yb == ya, 1, yb - ya)
+        pixel_rows = rows - 0.5
+        t = np.clip((pixel_rows - ya) / span, 0, 1)
+        between = (pixel_rows >= np.minimum(ya, yb)) & (
+            pixel_rows <= np.maximum(ya, yb)
+        )
+        lefts.append(np.where(between, x0[:-1] + (x0[1:] - x0[:-1]) * t, np.inf))
+        rights.append(
+            np.where(between, x1[:-1] + 1 + (x1[1:] - x1[:-1]) * t, -np.inf)
+        )
+
+    # Union of spans per row as run lengths: sort spans by start, merge them
+    # with a running max of their ends, then expand every row's alternating
+    # (gap, fill) runs with a single np.repeat.
+    left = np.concatenate(lefts)
+    right = np.concatenate(rights)
+    valid = right > left
+    # First column, and one past the last, whose pixel center is in the span
+    start = np.where(valid, np.clip(np.ceil(left - 0.5), 0, width), 0).astype(np.int64)
+    end = np.where(valid, np.clip(np.ceil(right - 0.5), 0, width), 0).astype(np.int64)
+    order = np.argsort(start, axis=0, kind="stable")
+    start = np.take_along_axis(start, order, axis=0)
+    reach = np.maximum.accumulate(np.take_along_axis(end, order, axis=0), axis=0)
+    prev_reach = np.vstack([np.zeros_like(reach[:1]), reach[:-1]])
+    run_start = np.maximum(start, prev_reach)
+    gaps = run_start - prev_reach
+    fills = np.maximum(reach - run_start, 0)
+
+    n_spans, n_rows = start.shape
+    counts = np.empty((n_rows, 2 * n_spans + 1), dtype=np.int64)
+    counts[:, 0:-1:2] = gaps.T
+    counts[:, 1:-1:2] = fills.T
+    counts[:, -1] = width - reach[-1]
+    values = np.zeros(2 * n_spans + 1, dtype=np.uint8)
+    values[1::2] = value
+    mask[top : bottom + 1] = np.repeat(
+        np.tile(values, n_rows), counts.ravel()
+    ).reshape(n_rows, width)
+    return mask
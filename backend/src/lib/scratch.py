@@ -0,0 +1,167 @@
+"""Per-job scratch directories for intermediate render files.
+
+Caption PNGs, downloaded sources and temporary audio are written to a
+RAM-backed directory (``/dev/shm`` by default) so render hot paths do not
+contend for disk with encodes. Each job gets its own subdirectory, removed
+when the job ends whether it succeeded or not; directories left behind by
+a killed process are swept when the next ``ScratchSpace`` is created.
+When the RAM directory is
+over its byte budget, or short of free space, files go to a disk fallback
+instead. So do files whose size the caller cannot estimate, since a write
+that outgrows tmpfs cannot be moved to disk halfway through.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+_current_job: ContextVar["JobScratch | None"] = ContextVar("scratch_job", default=None)
+
+
+class ScratchSpace:
+    """RAM-backed scratch root with a byte budget and a disk fallback root.
+
+    The budget counts the size hints of files placed in RAM by this process.
+    A job's share is trimmed to the files it still has whenever the budget
+    runs out, so deleted temporaries stop counting; the file system's free
+    space is checked as well, so other processes sharing the RAM root are
+    accounted for. Job directories are named ``<job_id>.<pid>``.
+    """
+
+    def __init__(self, root: str, fallback_root: str, max_bytes: int) -> None:
+        self.root = root
+        self.fallback_root = fallback_root
+        self.max_bytes = max_bytes
+        self.ram_reserved = 0
+        self._lock = threading.Lock()
+        self.purge_orphans()
+
+    def purge_orphans(self) -> int:
+        """Remove job directories whose process is gone (e.g. a SIGKILLed work-horse)."""
+
+        removed = 0
+        for root in (self.root, self.fallback_root):
+            try:
+                entries = list(os.scandir(root))
+            except OSError:
+                continue
+            for entry in entries:
+                _, _, pid = entry.name.rpartition(".")
+                if entry.is_dir(follow_symlinks=False) and pid.isdigit():
+                    if not _pid_alive(int(pid)):
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                        removed += 1
+        return removed
+
+    @contextmanager
+    def job(self, job_id: str) -> Iterator["JobScratch"]:
+        """Make ``job_id``'s scratch directories current for the block, then remove them."""
+
+        try:
+            os.makedirs(self.root, exist_ok=True)
+        except OSError:
+            pass  # RAM root unusable; every file takes the disk fallback
+        job = JobScratch(self, job_id)
+        token = _current_job.set(job)
+        try:
+            yield job
+        finally:
+            _current_job.reset(token)
+            job.cleanup()
+
+    def reserve(self, size_hint: int | None) -> bool:
+        """Reserve ``size_hint`` bytes of the RAM root, if they fit."""
+
+        if not size_hint or size_hint <= 0 or self.max_bytes <= 0:
+            return False
+        try:
+            free = shutil.disk_usage(self.root).free
+        except FileNotFoundError:
+            return False
+        with self._lock:
+            if size_hint >= free or self.ram_reserved + size_hint > self.max_bytes:
+                return False
+            self.ram_reserved += size_hint
+            return True
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self.ram_reserved = max(0, self.ram_reserved - size)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by someone else
+    return True
+
+
+class JobScratch:
+    """One job's RAM and disk scratch directories."""
+
+    def __init__(self, space: ScratchSpace, job_id: str) -> None:
+        self.space = space
+        # The pid lets purge_orphans tell a dead process' leftovers from live jobs
+        name = f"{job_id}.{os.getpid()}"
+        self.ram_dir = os.path.join(space.root, name)
+        self.disk_dir = os.path.join(space.fallback_root, name)
+        self.ram_reserved = 0
+        self.fallbacks = 0
+
+    def _trim_reservation(self) -> None:
+        """Shrink this job's reservation to the files still in its RAM directory."""
+
+        in_use = 0
+        try:
+            for entry in os.scandir(self.ram_dir):
+                try:
+                    in_use += entry.stat(follow_symlinks=False).st_size
+                except FileNotFoundError:
+                    continue
+        except FileNotFoundError:
+            pass
+        if in_use < self.ram_reserved:
+            self.space.release(self.ram_reserved - in_use)
+            self.ram_reserved = in_use
+
+    def dir_for(self, size_hint: int | None = None) -> str:
+        """Directory for a new file of about ``size_hint`` bytes (``None``: unknown)."""
+
+        placed = self.space.reserve(size_hint)
+        if not placed and size_hint and self.ram_reserved:
+            self._trim_reservation()
+            placed = self.space.reserve(size_hint)
+        if placed:
+            self.ram_reserved += size_hint
+            os.makedirs(self.ram_dir, exist_ok=True)
+            return self.ram_dir
+        self.fallbacks += 1
+        os.makedirs(self.disk_dir, exist_ok=True)
+        return self.disk_dir
+
+    def cleanup(self) -> None:
+        for path in (self.ram_dir, self.disk_dir):
+            shutil.rmtree(path, ignore_errors=True)
+        self.space.release(self.ram_reserved)
+        self.ram_reserved = 0
+
+
+def scratch_dir(size_hint: int | None = None) -> str | None:
+    """Scratch directory of the current job, or ``None`` outside a job.
+
+    Files without a ``size_hint`` go to the disk fallback.
+
+    ``None`` is what ``tempfile`` expects for its default location, so
+    callers can pass the result straight through as ``dir=``.
+    """
+
+    job = _current_job.get()
+    return job.dir_for(size_hint) if job is not None else None
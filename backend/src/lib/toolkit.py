@@ -3,25 +3,57 @@
 from __future__ import annotations
 
 import os
+import random
 import subprocess
-from typing import Tuple
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple, Union
 
-from .captioning.ffmpeg import build_ffmpeg_image_cmd, build_ffmpeg_video_cmd
-from .captioning.io import download_to_temp, ffprobe_json
+from PIL import Image, ImageOps
+
+from .captioning.ffmpeg import (
+    ENCODING_PROFILES,
+    build_ffmpeg_image_cmd,
+    build_ffmpeg_video_cmd,
+    build_ffmpeg_video_multi_cmd,
+)
+from .captioning.io import download_to_temp, ffprobe_json, ffprobe_keyframes
 from .captioning.layout import (
     compute_layout,
+    render_caption_image,
     render_caption_png,
     wrap_and_autoscale_text,
 )
 
+# Pillow encoder settings per output format for in-process captioning
+IMAGE_SAVE_OPTIONS: Dict[str, Dict[str, object]] = {
+    "jpeg": {
+        "format": "JPEG",
+        "quality": 85,
+        "optimize": True,
+        "progressive": True,
+        "subsampling": "4:2:0",
+    },
+    "webp": {"format": "WEBP", "quality": 80, "method": 2},
+}
+
+# Fitted backgrounds add_captions_to_images keeps for slides that reuse them
+FITTED_BACKGROUNDS_MAX = 3
+
 __all__ = [
     "add_caption_to_image",
+    "add_captions_to_images",
     "add_caption_to_video",
+    "add_captions_to_video",
     "compute_layout",
     "wrap_and_autoscale_text",
     "render_caption_png",
+    "render_caption_image",
     "build_ffmpeg_image_cmd",
     "build_ffmpeg_video_cmd",
+    "build_ffmpeg_video_multi_cmd",
+    "ENCODING_PROFILES",
+    "IMAGE_SAVE_OPTIONS",
     "download_to_temp",
     "ffprobe_json",
 ]
@@ -47,8 +79,14 @@ def add_caption_to_image(
     padding_ratio: float = 0.06,
     debug: bool = False,
     background_line_gap_px: int = 0,
+    text_renderer: str = "pil",
+    image_format: str | None = None,
 ) -> None:
-    """Load an image, add a caption, and save to ``out_path``."""
+    """Load an image, add a caption, and save to ``out_path``.
+
+    ``image_format`` (``"jpeg"`` or ``"webp"``) applies tuned encoder
+    settings; by default ffmpeg picks them from the ``out_path`` extension.
+    """
 
     layout = compute_layout(output_size, placement, padding_ratio)
     caption_box = layout["caption_box"]
@@ -73,6 +111,7 @@ def add_caption_to_image(
         background_padding_px=background_padding_px,
         background_line_gap_px=background_line_gap_px,
         debug=debug,
+        text_renderer=text_renderer,
     )
 
     temp_path: str | None = None
@@ -85,6 +124,7 @@ def add_caption_to_image(
             canvas_h=layout["canvas_h"],
             caption_png=caption_png,
             caption_box=caption_box,
+            image_format=image_format,
         )
         subprocess.run(
             cmd,
@@ -105,6 +145,118 @@ def add_caption_to_image(
             os.unlink(caption_png)
 
 
+def add_captions_to_images(
+    slides: Sequence[Tuple[str, str, str]],
+    *,
+    output_size: Tuple[int, int] = (1920, 1080),
+    font_path: str,
+    placement: str = "center",
+    size_preset: str = "medium",
+    text_color: Tuple[int, int, int] = (255, 255, 255),
+    stroke_color: Tuple[int, int, int] = (0, 0, 0),
+    stroke_width_px: int = 5,
+    background: str | None = "semi",
+    background_opacity: float = 0,
+    background_color: Tuple[int, int, int] | None = None,
+    background_style: str = "box",
+    background_padding_px: int = 20,
+    padding_ratio: float = 0.06,
+    background_line_gap_px: int = 0,
+    text_renderer: str = "pil",
+    image_format: str = "jpeg",
+) -> List[str]:
+    """Caption a batch of images in-process and return the output paths in order.
+
+    ``slides`` holds ``(source, caption, out_path)`` triples. Each slide is
+    composed like ``add_caption_to_image`` (fit and pad to ``output_size``,
+    caption overlaid in the caption box) but with Pillow in this process, so
+    a whole carousel shares one layout, the cached fonts and glyph atlas, and
+    the recently decoded backgrounds, and pays no per-slide ffmpeg
+    startup or temporary caption PNG. Slides are encoded with
+    ``IMAGE_SAVE_OPTIONS[image_format]`` whatever the ``out_path`` extension.
+    """
+
+    if image_format not in IMAGE_SAVE_OPTIONS:
+        raise ValueError(
+            f"Unknown image format {image_format!r}; "
+            f"expected one of {sorted(IMAGE_SAVE_OPTIONS)}"
+        )
+    save_options = IMAGE_SAVE_OPTIONS[image_format]
+
+    layout = compute_layout(output_size, placement, padding_ratio)
+    caption_box = layout["caption_box"]
+    canvas_size = (layout["canvas_w"], layout["canvas_h"])
+
+    # Slides of a carousel often share a background; keep the last few fitted
+    # ones (about 6 MB each at 1080x1920) rather than one per distinct source
+    fitted: OrderedDict[str, Image.Image] = OrderedDict()
+    out_paths: List[str] = []
+    for source, caption, out_path in slides:
+        caption_layout = wrap_and_autoscale_text(
+            caption,
+            font_path,
+            caption_box["w"],
+            caption_box["h"],
+            size_preset=size_preset,
+        )
+        caption_image = render_caption_image(
+            caption_layout,
+            font_path,
+            caption_box,
+            text_color=text_color,
+            stroke_color=stroke_color,
+            stroke_width_px=stroke_width_px,
+            background=background,
+            background_opacity=background_opacity,
+            background_color=background_color,
+            background_style=background_style,
+            background_padding_px=background_padding_px,
+            background_line_gap_px=background_line_gap_px,
+            text_renderer=text_renderer,
+        )
+
+        if source in fitted:
+            fitted.move_to_end(source)
+        else:
+            fitted[source] = _load_image_fitted(source, canvas_size)
+            if len(fitted) > FITTED_BACKGROUNDS_MAX:
+                fitted.popitem(last=False)
+        base = fitted[source].copy()
+        base.paste(caption_image, (caption_box["x"], caption_box["y"]), caption_image)
+        base.save(out_path, **save_options)
+        out_paths.append(out_path)
+
+    return out_paths
+
+
+def _load_image_fitted(source: str, canvas_size: Tuple[int, int]) -> Image.Image:
+    """Open ``source``, scale it to fit ``canvas_size`` and pad with black.
+
+    Mirrors the ``scale=...:force_original_aspect_ratio=decrease,pad=...``
+    chain of ``build_ffmpeg_image_cmd``.
+    """
+
+    temp_path: str | None = None
+    try:
+        path = source
+        if not Path(source).exists():
+            temp_path = download_to_temp(source)
+            path = temp_path
+        with Image.open(path) as image:
+            # JPEG sources decode straight at a reduced scale when much larger
+            # than the canvas; lanczos then does the final resize.
+            image.draft("RGB", canvas_size)
+            return ImageOps.pad(
+                image.convert("RGB"),
+                canvas_size,
+                method=Image.Resampling.LANCZOS,
+                color=(0, 0, 0),
+            )
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
 def add_caption_to_video(
     source: str,
     out_path: str,
@@ -128,8 +280,25 @@ def add_caption_to_video(
     preset: str = "medium",
     hw_accel: str | None = None,
     audio_copy: bool = False,
+    text_renderer: str = "pil",
+    max_duration: float | None = None,
+    start_offset: Union[float, str, None] = None,
+    profile: str | None = None,
+    poster_path: str | None = None,
+    preview_path: str | None = None,
 ) -> None:
-    """Load a video, add a caption overlay, and save to ``out_path``."""
+    """Load a video, add a caption overlay, and save to ``out_path``.
+
+    ``max_duration`` caps the encoded length in seconds. ``start_offset`` is
+    a time in seconds or ``"random"`` (which only applies together with
+    ``max_duration``, so an uncapped clip is never cut to a random tail);
+    the start is snapped back to the
+    nearest keyframe so ffmpeg's input seek lands on it without decoding
+    frames that are thrown away. ``profile`` selects one of
+    ``ENCODING_PROFILES`` in place of ``crf``/``preset``. ``poster_path``
+    and ``preview_path`` request a poster frame (JPEG/WebP) and a low-res
+    preview MP4 written by the same ffmpeg run.
+    """
 
     layout = compute_layout(output_size, placement, padding_ratio)
     caption_box = layout["caption_box"]
@@ -153,12 +322,18 @@ def add_caption_to_video(
         background_style=background_style,
         background_padding_px=background_padding_px,
         background_line_gap_px=background_line_gap_px,
+        text_renderer=text_renderer,
     )
 
     temp_path: str | None = None
     try:
         temp_path = download_to_temp(source)
-        ffprobe_json(temp_path)
+        start, duration = _plan_trim(
+            temp_path,
+            ffprobe_json(temp_path),
+            max_duration=max_duration,
+            start_offset=start_offset,
+        )
         cmd = build_ffmpeg_video_cmd(
             temp_path,
             out_path,
@@ -170,6 +345,11 @@ def add_caption_to_video(
             preset=preset,
             hw_accel=hw_accel,
             audio_copy=audio_copy,
+            start=start,
+            duration=duration,
+            profile=profile,
+            poster_path=poster_path,
+            preview_path=preview_path,
         )
         subprocess.run(
             cmd,
@@ -188,3 +368,166 @@ def add_caption_to_video(
             os.unlink(temp_path)
         if os.path.exists(caption_png):
             os.unlink(caption_png)
+
+
+def add_captions_to_video(
+    source: str,
+    captions: Sequence[Tuple[str, str]],
+    *,
+    output_size: Tuple[int, int] = (1920, 1080),
+    font_path: str,
+    placement: str = "center",
+    size_preset: str = "medium",
+    text_color: Tuple[int, int, int] = (255, 255, 255),
+    stroke_color: Tuple[int, int, int] = (0, 0, 0),
+    stroke_width_px: int = 5,
+    background: str | None = "semi",
+    background_opacity: float = 0,
+    background_color: Tuple[int, int, int] | None = None,
+    background_style: str = "box",
+    background_padding_px: int = 20,
+    background_line_gap_px: int = 0,
+    padding_ratio: float = 0.06,
+    crf: int = 18,
+    preset: str = "medium",
+    hw_accel: str | None = None,
+    audio_copy: bool = False,
+    text_renderer: str = "pil",
+    max_duration: float | None = None,
+    start_offset: Union[float, str, None] = None,
+    profile: str | None = None,
+    poster_paths: Sequence[str | None] | None = None,
+    preview_paths: Sequence[str | None] | None = None,
+) -> None:
+    """Caption one video into several outputs with a single ffmpeg run.
+
+    ``captions`` holds ``(caption, out_path)`` pairs. The source is downloaded,
+    decoded and scaled once and split into one overlay branch per caption;
+    every output is encoded with the same settings as ``add_caption_to_video``,
+    including the ``max_duration``/``start_offset`` trim and ``profile``.
+    ``poster_paths``/``preview_paths``, aligned with ``captions``, add each
+    output's optional poster frame and preview rendition.
+    """
+
+    if not captions:
+        return
+
+    layout = compute_layout(output_size, placement, padding_ratio)
+    caption_box = layout["caption_box"]
+
+    caption_pngs: List[str] = []
+    temp_path: str | None = None
+    try:
+        for caption, _ in captions:
+            caption_layout = wrap_and_autoscale_text(
+                caption,
+                font_path,
+                caption_box["w"],
+                caption_box["h"],
+                size_preset=size_preset,
+            )
+            caption_pngs.append(
+                render_caption_png(
+                    caption_layout,
+                    font_path,
+                    caption_box,
+                    text_color=text_color,
+                    stroke_color=stroke_color,
+                    stroke_width_px=stroke_width_px,
+                    background=background,
+                    background_opacity=background_opacity,
+                    background_color=background_color,
+                    background_style=background_style,
+                    background_padding_px=background_padding_px,
+                    background_line_gap_px=background_line_gap_px,
+                    text_renderer=text_renderer,
+                )
+            )
+
+        temp_path = download_to_temp(source)
+        start, duration = _plan_trim(
+            temp_path,
+            ffprobe_json(temp_path),
+            max_duration=max_duration,
+            start_offset=start_offset,
+        )
+        cmd = build_ffmpeg_video_multi_cmd(
+            temp_path,
+            [
+                (out_path, caption_png, caption_box)
+                for (_, out_path), caption_png in zip(captions, caption_pngs)
+            ],
+            canvas_w=layout["canvas_w"],
+            canvas_h=layout["canvas_h"],
+            crf=crf,
+            preset=preset,
+            hw_accel=hw_accel,
+            audio_copy=audio_copy,
+            start=start,
+            duration=duration,
+            profile=profile,
+            poster_paths=poster_paths,
+            preview_paths=preview_paths,
+        )
+        subprocess.run(
+            cmd,
+            check=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            close_fds=True,
+        )
+    except subprocess.CalledProcessError as exc:
+        stderr = exc.stderr or ""
+        raise RuntimeError(f"ffmpeg failed: {stderr[-500:]}") from exc
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+        for caption_png in caption_pngs:
+            if os.path.exists(caption_png):
+                os.unlink(caption_png)
+
+
+def _plan_trim(
+    src_path: str,
+    probe: Dict[str, object],
+    *,
+    max_duration: float | None,
+    start_offset: Union[float, str, None],
+) -> Tuple[float | None, float | None]:
+    """Return the keyframe-aligned ``(start, duration)`` to encode from ``src_path``."""
+
+    if max_duration is not None and max_duration <= 0:
+        raise ValueError("max_duration must be > 0")
+    if start_offset == "random" and max_duration is None:
+        start_offset = None  # without a cap, keep the whole clip
+    if max_duration is None and not start_offset:
+        return None, None
+
+    try:
+        total = float(probe.get("format", {}).get("duration"))
+    except (TypeError, ValueError):
+        total = None
+
+    start = 0.0
+    if start_offset:
+        keyframes = ffprobe_keyframes(src_path) or [0.0]
+        if start_offset == "random":
+            # Prefer starts that leave a full max_duration of clip
+            latest = total - (max_duration or 0) if total is not None else None
+            candidates = [k for k in keyframes if latest is None or k <= latest]
+            start = random.choice(candidates or keyframes[:1])
+        elif isinstance(start_offset, str):
+            raise ValueError(
+                f"start_offset must be seconds or 'random', got {start_offset!r}"
+            )
+        else:
+            if start_offset < 0:
+                raise ValueError("start_offset must be >= 0")
+            start = max((k for k in keyframes if k <= start_offset), default=0.0)
+
+    duration = max_duration
+    if duration is not None and total is not None and start + duration >= total:
+        duration = None
+    return start or None, duration
@@ -7,8 +7,13 @@ from dotenv import load_dotenv
 
 from src.api import api_router
 from src.auth.service import tiktok_refresh_daemon
+from src.auth.token_cache import token_eviction_daemon
 from src.publishing.service import publish_scheduler_daemon
+from src.core.http import close_http_client, init_http_client
 from src.core.supabase import init_supabase
+from src.jobs.fairshare import fair_dispatch_daemon
+from src.storage.retention import outputs_retention_daemon
+from src.storage.thumbnails import ThumbnailStaticFiles
 
 load_dotenv()
 
@@ -16,10 +21,14 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.supabase = init_supabase()
+    app.state.http = init_http_client()
     stop_event = asyncio.Event()
     app.state.spawn_events = [
         asyncio.create_task(tiktok_refresh_daemon(app, stop_event)),
+        asyncio.create_task(token_eviction_daemon(app, stop_event)),
         asyncio.create_task(publish_scheduler_daemon(app, stop_event)),
+        asyncio.create_task(outputs_retention_daemon(app, stop_event)),
+        asyncio.create_task(fair_dispatch_daemon(app, stop_event)),
     ]
     try:
         yield
@@ -28,6 +37,7 @@ async def lifespan(app: FastAPI):
         for t in app.state.spawn_events:
             t.cancel()
         await asyncio.gather(*app.state.spawn_events, return_exceptions=True)
+        await close_http_client()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -44,7 +54,7 @@ app.include_router(api_router)
 from fastapi.staticfiles import StaticFiles
 
 os.makedirs("./outputs", exist_ok=True)
-app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
+app.mount("/outputs", ThumbnailStaticFiles(directory="outputs"), name="outputs")
 app.mount(
     "/scraped-video", StaticFiles(directory="scraped-video"), name="scraped-video"
 )
@@ -1,6 +1,6 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.encoders import jsonable_encoder
-import httpx, asyncio
+import asyncio
 from datetime import datetime
 from typing import Union
 from postgrest.exceptions import APIError
@@ -14,7 +14,12 @@ from src.auth.service import (
 )
 from .models import PublishingCarouselPost, PublishingPost, PostStatus
 from src.core.logging_config import logger
+from src.core.config import settings
+from src.core.http import get_http_client
+from src.core.redis import get_redis
+from src.core.supabase import aexecute, run_blocking
 from src.auth.utils import utcnow
+from src.publishing import timer
 
 
 async def update_post_in_supabase(
@@ -24,9 +29,16 @@ async def update_post_in_supabase(
     publishing_post: Union[PublishingPost, PublishingCarouselPost],
 ):
     user_id = user["sub"]
-    supabase.table("publishing").update(jsonable_encoder(publishing_post)).eq(
-        "id", post_id
-    ).eq("user_id", user_id).execute()
+    res = await aexecute(
+        supabase.table("publishing")
+        .update(jsonable_encoder(publishing_post))
+        .eq("id", post_id)
+        .eq("user_id", user_id)
+    )
+    if res.data:
+        await run_blocking(
+            timer.schedule, get_redis(), post_id, user_id, publishing_post.scheduled_at
+        )
 
 
 async def schedule_post_to_supabase(
@@ -47,23 +59,25 @@ async def schedule_post_to_supabase(
     }
 
     try:
-        supabase.table("publishing").insert(jsonable_encoder(data)).execute()
+        res = await aexecute(supabase.table("publishing").insert(jsonable_encoder(data)))
     except APIError as e:
         if e.code == "23505":  # unique constraint violation
             raise HTTPException(status_code=400, detail="This is already published")
         raise
+    await run_blocking(
+        timer.schedule, get_redis(), res.data[0]["id"], user_id, publishing_post.scheduled_at
+    )
 
 
 async def check_post_status(supabase, user, id):
     user_id = user["sub"]
     try:
-        data = (
+        data = await aexecute(
             supabase.table("publishing")
             .select("open_id,result")
             .eq("id", id)
             .eq("user_id", user_id)
             .single()
-            .execute()
         )
     except APIError as e:
         if e.code == "PGRST116":
@@ -74,15 +88,15 @@ async def check_post_status(supabase, user, id):
     open_id = data.data["open_id"]
     token = await ensure_fresh_access(supabase, user_id, open_id)
     payload = {"publish_id": publish_id}
-    async with httpx.AsyncClient(timeout=60) as c:
-        r = await c.post(
-            "https://open.tiktokapis.com/v2/post/publish/status/fetch/",
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json; charset=UTF-8",
-            },
-            json=payload,
-        )
+    r = await get_http_client().post(
+        "https://open.tiktokapis.com/v2/post/publish/status/fetch/",
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=UTF-8",
+        },
+        json=payload,
+        timeout=60,
+    )
     if r.status_code != 200:
         raise RuntimeError(f"TikTok API error {r.status_code}: {r.text}")
 
@@ -93,13 +107,12 @@ async def check_post_status(supabase, user, id):
 async def _publish_post(supabase, user, id):
     user_id = user["sub"]
     try:
-        data = (
+        data = await aexecute(
             supabase.table("publishing")
             .select("*")
             .eq("id", id)
             .eq("user_id", user_id)
             .single()
-            .execute()
         )
     except APIError as e:
         if e.code == "PGRST116":
@@ -150,15 +163,15 @@ async def _publish_post(supabase, user, id):
             },
         }
 
-    async with httpx.AsyncClient(timeout=60) as c:
-        r = await c.post(
-            POST_VIDEO_INIT if isVideo else POST_CAROUSEL_INIT,
-            json=payload,
-            headers={
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json; charset=UTF-8",
-            },
-        )
+    r = await get_http_client().post(
+        POST_VIDEO_INIT if isVideo else POST_CAROUSEL_INIT,
+        json=payload,
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json; charset=UTF-8",
+        },
+        timeout=60,
+    )
 
     if r.status_code != 200:
         # logger.info("tiktok missed")
@@ -167,13 +180,18 @@ async def _publish_post(supabase, user, id):
 
     result = r.json()
 
-    supabase.table("publishing").update(
-        {
-            "result": result,
-            "status": PostStatus.published,
-            "published_at": utcnow().isoformat(),
-        }
-    ).eq("id", id).eq("user_id", user_id).execute()
+    await aexecute(
+        supabase.table("publishing")
+        .update(
+            {
+                "result": result,
+                "status": PostStatus.published,
+                "published_at": utcnow().isoformat(),
+            }
+        )
+        .eq("id", id)
+        .eq("user_id", user_id)
+    )
 
     return result
 
@@ -183,52 +201,105 @@ async def publish_post(supabase, user, id):
         return await _publish_post(supabase, user, id)
     except Exception as e:
         logger.error("Failed to publish post: %s", str(e))
-        supabase.table("publishing").update(
-            {"status": PostStatus.failed, "error": str(e)}
-        ).eq("id", id).eq("user_id", user["sub"]).execute()
+        await aexecute(
+            supabase.table("publishing")
+            .update({"status": PostStatus.failed, "error": str(e)})
+            .eq("id", id)
+            .eq("user_id", user["sub"])
+        )
         raise
 
 
-async def publish_due_posts(supabase):
-    posts = (
-        supabase.table("publishing")
-        .select("*")
-        .lte("scheduled_at", utcnow())
-        .eq("status", "scheduled")
-        .execute()
-        .data
-        or []
-    )
-
-    coros = [publish_post(supabase, {"sub": p["user_id"]}, p["id"]) for p in posts]
-    results = await asyncio.gather(*coros, return_exceptions=True)
+async def publish_scheduled_post(supabase, post_id: str, user_id: str) -> None:
+    """Publish a post popped from the timer, if Supabase still has it as scheduled.
 
-    success = 0
-    failed = 0
+    Moving the row to ``publishing`` first claims it: the reconciler only
+    indexes ``scheduled`` rows, so it cannot hand the post out again while
+    the TikTok call is in flight. The claim is recorded in Redis beforehand,
+    so the reconciler can tell an abandoned claim from one in progress.
+    """
 
-    for p, r in zip(posts, results):
-        if isinstance(r, Exception):
-            success += 1
-            logger.error(f"publish failed user={p['user_id']} post={p['id']}: {r}")
+    redis = get_redis()
+    await run_blocking(timer.mark_claimed, redis, post_id)
+    try:
+        claimed = await aexecute(
+            supabase.table("publishing")
+            .update({"status": PostStatus.publishing})
+            .eq("id", post_id)
+            .eq("user_id", user_id)
+            .eq("status", PostStatus.scheduled)
+        )
+        if not claimed.data:
+            return  # published, canceled or deleted since it was indexed
+        try:
+            await publish_post(supabase, {"sub": user_id}, post_id)
+        except Exception as e:
+            logger.error(f"publish failed user={user_id} post={post_id}: {e}")
         else:
-            failed += 1
-            logger.info(f"publish ok user={p['user_id']} post={p['id']}")
-
-    logger.info(f"publish summary: success={success} failed={failed}")
+            logger.info(f"publish ok user={user_id} post={post_id}")
+    finally:
+        await run_blocking(timer.clear_claimed, redis, post_id)
 
 
 async def publish_scheduler_daemon(app: FastAPI, stop_event: asyncio.Event) -> None:
-    interval = max(10, 6000)
-    supabase = app.state.supabase
+    """Fire scheduled posts as they come due.
 
-    while not stop_event.is_set():
-        logger.info("Checking for due scheduled posts...")
-        try:
-            await publish_due_posts(supabase)
-        except Exception:
-            logger.exception("Error while processing scheduled posts")
+    Sleeps until the earliest post in the Redis timer (capped at
+    ``settings.publish_timer_max_sleep_s``), pops everything due and
+    publishes it in the background. Supabase is only scanned every
+    ``settings.publish_reconcile_interval_s`` to re-index scheduled posts
+    and fail abandoned claims. On shutdown, publishes still in flight get
+    ``settings.publish_shutdown_grace_s`` to finish and are then cancelled;
+    their rows are failed by the next reconcile.
+    """
 
-        try:
-            await asyncio.wait_for(stop_event.wait(), timeout=interval)
-        except asyncio.TimeoutError:
-            continue
+    supabase = app.state.supabase
+    redis = get_redis()
+    loop = asyncio.get_running_loop()
+    publishing = set()
+    next_reconcile = 0.0
+
+    try:
+        while not stop_event.is_set():
+            delay = settings.publish_timer_max_sleep_s
+            try:
+                if loop.time() >= next_reconcile:
+                    summary = await run_blocking(
+                        timer.reconcile, supabase, redis, settings.publish_claim_timeout_s
+                    )
+                    logger.info("Reconciled scheduled posts", extra=summary)
+                    next_reconcile = loop.time() + settings.publish_reconcile_interval_s
+
+                due = await run_blocking(
+                    timer.pop_due, redis, utcnow().timestamp(), settings.publish_timer_batch
+                )
+                for post_id, user_id in due:
+                    task = asyncio.create_task(
+                        publish_scheduled_post(supabase, post_id, user_id)
+                    )
+                    publishing.add(task)
+                    task.add_done_callback(publishing.discard)
+
+                if len(due) == settings.publish_timer_batch:
+                    delay = 0  # more may be due already
+                else:
+                    due_in = await run_blocking(
+                        timer.next_due_in, redis, utcnow().timestamp()
+                    )
+                    if due_in is not None:
+                        delay = max(0.0, min(delay, due_in))
+            except Exception:
+                logger.exception("Error while processing scheduled posts")
+
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                continue
+    finally:
+        if publishing:
+            _, unfinished = await asyncio.wait(
+                set(publishing), timeout=settings.publish_shutdown_grace_s
+            )
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
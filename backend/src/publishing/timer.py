@@ -0,0 +1,154 @@
+"""Redis sorted-set index of scheduled posts.
+
+``bulks:publish:due`` holds post ids scored by their ``scheduled_at`` epoch
+seconds, and ``bulks:publish:owner`` maps each post id to its user.
+Scheduling or rescheduling a post is one ``ZADD``, finding the next due
+time is ``ZRANGE 0 0``, and due posts are popped atomically in one script,
+so each post is handed to exactly one API process. Supabase remains the
+source of truth: ``reconcile`` periodically re-indexes every scheduled row,
+and a popped post is only published if its row is still ``scheduled``.
+
+While a post is being published its row is ``publishing`` and its id is in
+``bulks:publish:claimed``, scored by when the claim was taken. ``reconcile``
+marks ``publishing`` rows failed once their claim is older than the claim
+timeout or gone, as happens when the process publishing them dies.
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from redis import Redis
+from supabase import Client
+
+from src.auth.utils import parse_ts
+from src.publishing.models import PostStatus
+
+DUE_KEY = "bulks:publish:due"
+OWNER_KEY = "bulks:publish:owner"
+CLAIMED_KEY = "bulks:publish:claimed"
+
+# Pops up to ARGV[2] posts due at or before ARGV[1], with their owners.
+# KEYS: due, owner.  Returns a flat {post_id, user_id, ...} list.
+_POP_DUE = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #ids == 0 then
+    return {}
+end
+local owners = redis.call('HMGET', KEYS[2], unpack(ids))
+redis.call('ZREM', KEYS[1], unpack(ids))
+redis.call('HDEL', KEYS[2], unpack(ids))
+local out = {}
+for i, id in ipairs(ids) do
+    out[#out + 1] = id
+    out[#out + 1] = owners[i] or ''
+end
+return out
+"""
+
+
+def _score(scheduled_at: datetime | str | None) -> float:
+    if scheduled_at is None:
+        return time.time()  # null => publish ASAP
+    if isinstance(scheduled_at, str):
+        scheduled_at = parse_ts(scheduled_at)
+    if scheduled_at.tzinfo is None:
+        # Naive times are UTC, like Supabase's; .timestamp() would read them as local
+        scheduled_at = scheduled_at.replace(tzinfo=timezone.utc)
+    return scheduled_at.timestamp()
+
+
+def schedule(
+    redis: Redis, post_id: str, user_id: str, scheduled_at: datetime | str | None
+) -> None:
+    """Index ``post_id`` to fire at ``scheduled_at``, replacing any earlier time."""
+
+    pipe = redis.pipeline()
+    pipe.zadd(DUE_KEY, {str(post_id): _score(scheduled_at)})
+    pipe.hset(OWNER_KEY, str(post_id), user_id)
+    pipe.execute()
+
+
+def pop_due(redis: Redis, now: float, limit: int) -> List[Tuple[str, str]]:
+    """Remove and return ``(post_id, user_id)`` for up to ``limit`` posts due by ``now``."""
+
+    flat = redis.eval(_POP_DUE, 2, DUE_KEY, OWNER_KEY, now, limit)
+    return [
+        (flat[i].decode(), flat[i + 1].decode()) for i in range(0, len(flat), 2)
+    ]
+
+
+def next_due_in(redis: Redis, now: float) -> Optional[float]:
+    """Seconds until the earliest indexed post is due (<= 0 if overdue), or ``None``."""
+
+    head = redis.zrange(DUE_KEY, 0, 0, withscores=True)
+    return head[0][1] - now if head else None
+
+
+def mark_claimed(redis: Redis, post_id: str) -> None:
+    """Record that ``post_id`` is about to be claimed for publishing."""
+
+    redis.zadd(CLAIMED_KEY, {str(post_id): time.time()})
+
+
+def clear_claimed(redis: Redis, post_id: str) -> None:
+    redis.zrem(CLAIMED_KEY, str(post_id))
+
+
+def _fail_stale_claims(supabase: Client, redis: Redis, claim_timeout_s: float) -> int:
+    stale_before = time.time() - claim_timeout_s
+    rows = (
+        supabase.table("publishing")
+        .select("id")
+        .eq("status", PostStatus.publishing.value)
+        .execute()
+        .data
+        or []
+    )
+    pipe = redis.pipeline()
+    for row in rows:
+        pipe.zscore(CLAIMED_KEY, str(row["id"]))
+    stale = [
+        str(row["id"])
+        for row, claimed_at in zip(rows, pipe.execute() if rows else [])
+        if claimed_at is None or claimed_at < stale_before
+    ]
+    if stale:
+        # Only rows still publishing: a post that just finished keeps its result
+        supabase.table("publishing").update(
+            {"status": PostStatus.failed.value, "error": "Publishing was interrupted"}
+        ).in_("id", stale).eq("status", PostStatus.publishing.value).execute()
+    redis.zremrangebyscore(CLAIMED_KEY, "-inf", stale_before)
+    return len(stale)
+
+
+def reconcile(supabase: Client, redis: Redis, claim_timeout_s: float) -> Dict[str, int]:
+    """Index every post Supabase has as ``scheduled`` and fail abandoned claims.
+
+    Picks up posts scheduled by other means than this API and restores the
+    index after a Redis flush. Entries for posts that are no longer
+    scheduled are left alone: they are discarded when they come due.
+    """
+
+    interrupted = _fail_stale_claims(supabase, redis, claim_timeout_s)
+
+    posts = (
+        supabase.table("publishing")
+        .select("id,user_id,scheduled_at")
+        .eq("status", PostStatus.scheduled.value)
+        .execute()
+        .data
+        or []
+    )
+    if posts:
+        pipe = redis.pipeline()
+        pipe.zadd(DUE_KEY, {str(p["id"]): _score(p.get("scheduled_at")) for p in posts})
+        pipe.hset(OWNER_KEY, mapping={str(p["id"]): p["user_id"] for p in posts})
+        pipe.execute()
+    return {
+        "scheduled": len(posts),
+        "indexed": redis.zcard(DUE_KEY),
+        "interrupted": interrupted,
+    }
@@ -0,0 +1,261 @@
+"""Retention and eviction of generated job outputs in ``settings.output_dir``.
+
+Every job writes into ``<output_dir>/<job_id>/``. A job directory is evicted
+when it is older than the retention window, or, oldest first, while the
+disk holding ``output_dir`` is above its high-water mark. Jobs still
+running, and jobs with any post that is not yet published (draft,
+scheduled, queued, publishing or failed), are never evicted. Finished jobs
+that were never turned into a post are kept for the full retention window:
+disk pressure only evicts jobs whose posts have all been published.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, Iterable, List, Set, Tuple
+
+from fastapi import FastAPI
+from supabase import Client
+
+from src.auth.utils import utcnow
+from src.core.config import settings
+from src.core.logging_config import logger
+from src.publishing.models import PostStatus
+
+# Posts in these states still need their media on disk
+PROTECTED_POST_STATUSES = [
+    PostStatus.draft.value,
+    PostStatus.scheduled.value,
+    PostStatus.queued.value,
+    PostStatus.publishing.value,
+    PostStatus.failed.value,
+]
+ACTIVE_JOB_STATUSES = ["created", "queued", "started", "deferred"]
+# PostgREST's default max-rows; larger results are truncated without error
+PAGE_SIZE = 1000
+
+
+def scan_outputs(output_dir: str) -> List[Dict[str, object]]:
+    """Return one ``{"job_id", "path", "bytes", "mtime"}`` entry per job directory.
+
+    ``mtime`` is the newest modification time of anything in the directory.
+    """
+
+    jobs: List[Dict[str, object]] = []
+    try:
+        entries = list(os.scandir(output_dir))
+    except FileNotFoundError:
+        return jobs
+
+    for entry in entries:
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        total = 0
+        newest = entry.stat(follow_symlinks=False).st_mtime
+        for root, _, files in os.walk(entry.path):
+            for name in files:
+                try:
+                    st = os.stat(os.path.join(root, name), follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                total += st.st_size
+                newest = max(newest, st.st_mtime)
+        jobs.append(
+            {"job_id": entry.name, "path": entry.path, "bytes": total, "mtime": newest}
+        )
+    return jobs
+
+
+def job_ids_from_reference(reference: str | None) -> Set[str]:
+    """Job ids a publishing ``special_reference_id`` (``<job_id>-<index>``) may name.
+
+    Both the reference itself and its prefix before the trailing index are
+    returned, since a bare job id can also end in a digits-only group.
+    """
+
+    if not reference:
+        return set()
+    job_id, sep, index = reference.rpartition("-")
+    if sep and index.isdigit():
+        return {reference, job_id}
+    return {reference}
+
+
+def _select_all(make_query: Callable[[], Any]) -> List[Dict[str, Any]]:
+    """Every row of ``make_query()``, fetched ``PAGE_SIZE`` rows at a time.
+
+    ``make_query`` builds a fresh, ordered query for each page. Errors
+    propagate, so a partial result is never mistaken for the whole set.
+    """
+
+    rows: List[Dict[str, Any]] = []
+    while True:
+        page = make_query().range(len(rows), len(rows) + PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+
+
+def protected_and_posted_job_ids(supabase: Client) -> Tuple[Set[str], Set[str]]:
+    """Job ids whose outputs must be kept, and job ids that have any post.
+
+    The first set holds running jobs and jobs with unpublished posts.
+    """
+
+    unpublished = _select_all(
+        lambda: supabase.table("publishing")
+        .select("id,special_reference_id")
+        .in_("status", PROTECTED_POST_STATUSES)
+        .order("id")
+    )
+    posts = _select_all(
+        lambda: supabase.table("publishing").select("id,special_reference_id").order("id")
+    )
+    active = _select_all(
+        lambda: supabase.table("jobs")
+        .select("id")
+        .in_("status", ACTIVE_JOB_STATUSES)
+        .order("id")
+    )
+    protected = {row["id"] for row in active}
+    for post in unpublished:
+        protected.update(job_ids_from_reference(post.get("special_reference_id")))
+    posted: Set[str] = set()
+    for post in posts:
+        posted.update(job_ids_from_reference(post.get("special_reference_id")))
+    return protected, posted
+
+
+def plan_evictions(
+    jobs: Iterable[Dict[str, object]],
+    protected: Set[str],
+    *,
+    now: float,
+    disk_total: int,
+    disk_used: int,
+    max_age_s: float,
+    min_age_s: float,
+    high_water: float,
+    low_water: float,
+    posted: Set[str] | None = None,
+) -> List[Dict[str, object]]:
+    """Choose the job directories to delete, oldest first.
+
+    Everything past ``max_age_s`` goes. If disk usage is still above
+    ``high_water`` (a fraction of ``disk_total``), more jobs older than
+    ``min_age_s`` are evicted until the projected usage drops below
+    ``low_water``. When ``posted`` is given, only jobs in it are evicted
+    for space; the rest wait out ``max_age_s``.
+    """
+
+    candidates = sorted(
+        (job for job in jobs if job["job_id"] not in protected),
+        key=lambda job: job["mtime"],
+    )
+    evict: List[Dict[str, object]] = []
+    used = disk_used
+    for job in candidates:
+        if now - job["mtime"] > max_age_s:
+            evict.append(job)
+            used -= job["bytes"]
+
+    if disk_total and used > high_water * disk_total:
+        chosen = {job["job_id"] for job in evict}
+        for job in candidates:
+            if used <= low_water * disk_total:
+                break
+            if job["job_id"] in chosen or now - job["mtime"] < min_age_s:
+                continue
+            if posted is not None and job["job_id"] not in posted:
+                continue
+            evict.append(job)
+            used -= job["bytes"]
+    return evict
+
+
+def sweep_thumbnails(thumbnail_dir: str, max_age_s: float, now: float) -> int:
+    """Delete cached thumbnails not written within ``max_age_s``; return the count."""
+
+    removed = 0
+    try:
+        entries = list(os.scandir(thumbnail_dir))
+    except FileNotFoundError:
+        return removed
+    for entry in entries:
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > max_age_s:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def evict_outputs(supabase: Client) -> Dict[str, int]:
+    """Run one retention pass and mark evicted jobs in Supabase."""
+
+    now = time.time()
+    max_age_s = settings.output_retention_days * 86400
+    jobs = scan_outputs(settings.output_dir)
+    usage = shutil.disk_usage(settings.output_dir)
+    protected, posted = protected_and_posted_job_ids(supabase)
+    evict = plan_evictions(
+        jobs,
+        protected,
+        now=now,
+        disk_total=usage.total,
+        disk_used=usage.used,
+        max_age_s=max_age_s,
+        min_age_s=settings.output_min_age_s,
+        high_water=settings.output_high_water,
+        low_water=settings.output_low_water,
+        posted=posted,
+    )
+
+    evicted: List[str] = []
+    freed = 0
+    for job in evict:
+        try:
+            shutil.rmtree(job["path"])
+        except OSError:
+            logger.exception(f"failed to evict outputs of job={job['job_id']}")
+            continue
+        evicted.append(job["job_id"])
+        freed += job["bytes"]
+
+    if evicted:
+        supabase.table("jobs").update({"evicted_at": utcnow().isoformat()}).in_(
+            "id", evicted
+        ).execute()
+
+    return {
+        "jobs": len(jobs),
+        "evicted": len(evicted),
+        "freed_bytes": freed,
+        "thumbnails_removed": sweep_thumbnails(settings.thumbnail_dir, max_age_s, now),
+    }
+
+
+async def outputs_retention_daemon(app: FastAPI, stop_event: asyncio.Event) -> None:
+    interval = max(60, settings.output_retention_interval_s)
+    supabase = app.state.supabase
+
+    while not stop_event.is_set():
+        try:
+            summary = await asyncio.to_thread(evict_outputs, supabase)
+            logger.info(
+                "outputs retention: jobs={jobs} evicted={evicted} "
+                "freed_bytes={freed_bytes} thumbnails_removed={thumbnails_removed}".format(
+                    **summary
+                )
+            )
+        except Exception:
+            logger.exception("Error while evicting outputs")
+
+        try:
+            await asyncio.wait_for(stop_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            continue
@@ -0,0 +1,119 @@
+"""Resized derivatives of generated images, served from the ``/outputs`` mount."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import stat
+import tempfile
+from typing import Tuple
+
+import anyio
+from PIL import Image
+from starlette.datastructures import QueryParams
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from src.core.config import settings
+
+# Requested widths are rounded up to one of these, so the derivative cache
+# holds a handful of files per image whatever ``w`` clients send.
+THUMBNAIL_WIDTHS = (135, 270, 360, 540, 720)
+THUMBNAIL_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def snap_width(width: int) -> int:
+    """Return the smallest supported thumbnail width >= ``width``."""
+
+    for candidate in THUMBNAIL_WIDTHS:
+        if width <= candidate:
+            return candidate
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def thumbnail_key(rel_path: str, mtime_ns: int, width: int) -> str:
+    """Cache key (and ETag) of the ``width`` derivative of one file version."""
+
+    return hashlib.sha1(f"{rel_path}\0{mtime_ns}\0{width}".encode()).hexdigest()
+
+
+def ensure_thumbnail(src_path: str, key: str, width: int) -> str:
+    """Return the cached derivative for ``key``, rendering it on first use.
+
+    JPEG sources are decoded in draft mode at the smallest DCT scale that is
+    still at least ``width`` wide, so a 1080px slide decodes at 1/2 or 1/4
+    size before the final resize.
+    """
+
+    os.makedirs(settings.thumbnail_dir, exist_ok=True)
+    thumb_path = os.path.join(settings.thumbnail_dir, f"{key}.jpg")
+    if os.path.exists(thumb_path):
+        return thumb_path
+
+    with Image.open(src_path) as image:
+        if image.width <= width:
+            size: Tuple[int, int] = image.size
+        else:
+            size = (width, max(1, round(image.height * width / image.width)))
+        image.draft("RGB", size)
+        thumb = image.convert("RGB")
+        if thumb.size != size:
+            thumb = thumb.resize(size, Image.Resampling.LANCZOS)
+
+    # Write then rename so concurrent requests never serve a partial file
+    fd, tmp_path = tempfile.mkstemp(suffix=".jpg", dir=settings.thumbnail_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            thumb.save(tmp, format="JPEG", quality=82, optimize=True, progressive=True)
+        os.replace(tmp_path, thumb_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return thumb_path
+
+
+class ThumbnailStaticFiles(StaticFiles):
+    """``StaticFiles`` that serves a cached resized copy of images given ``?w=``.
+
+    Requests without ``w`` (and non-image files) are served unchanged.
+    Derivatives are keyed by path, mtime and width and sent with an ``ETag``
+    and an immutable ``Cache-Control``.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        raw_width = QueryParams(scope.get("query_string", b"")).get("w")
+        if raw_width is None or scope["method"] not in ("GET", "HEAD"):
+            return await super().get_response(path, scope)
+        try:
+            requested = int(raw_width)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="w must be an integer")
+        if requested <= 0:
+            raise HTTPException(status_code=400, detail="w must be positive")
+        width = snap_width(requested)
+
+        try:
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        except (OSError, ValueError):
+            return await super().get_response(path, scope)
+        if (
+            stat_result is None
+            or not stat.S_ISREG(stat_result.st_mode)
+            or os.path.splitext(full_path)[1].lower() not in THUMBNAIL_SUFFIXES
+        ):
+            return await super().get_response(path, scope)
+
+        key = thumbnail_key(path, stat_result.st_mtime_ns, width)
+        headers = {"ETag": f'"{key}"', "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        if_none_match = dict(scope["headers"]).get(b"if-none-match", b"").decode()
+        if f'"{key}"' in if_none_match:
+            return Response(status_code=304, headers=headers)
+
+        thumb_path = await anyio.to_thread.run_sync(
+            ensure_thumbnail, full_path, key, width
+        )
+        return FileResponse(thumb_path, media_type="image/jpeg", headers=headers)
@@ -0,0 +1,58 @@
+"""Admission control for workflow endpoints.
+
+A request is turned away with 429 and ``Retry-After`` when the queue it
+would be routed to already holds ``max_backlog`` jobs, or when the user's
+token bucket for the job type cannot pay for the items requested. A
+request for more items than the bucket holds (``burst``) could never be
+paid and is rejected with 422. The limits are per job type, from
+``settings.admission_limits``; bulk submissions use the ``BULK_<TYPE>``
+entries.
+"""
+
+from fastapi import HTTPException, status
+from redis import Redis
+from rq import Queue
+
+from src.core.config import settings
+from src.core.ratelimit import take_tokens
+from src.jobs.fairshare import backlog
+
+
+def admit(
+    redis: Redis, queue: Queue, user_id: str, job_type: str, items: int, jobs: int = 1
+) -> None:
+    """Raise 429 unless ``jobs`` ``job_type`` jobs totalling ``items`` items may be queued now."""
+
+    limits = settings.admission_limits[job_type]
+    label = job_type.lower().replace("_", " ")
+    cost = max(1, items)
+    if cost > limits["burst"]:
+        raise HTTPException(
+            status_code=422,
+            detail=(
+                f"{cost} {label} items exceed the limit of "
+                f"{int(limits['burst'])} per request, split them up"
+            ),
+        )
+
+    # Checked first so that a rejected request does not spend the user's tokens
+    if backlog(queue) + jobs > limits["max_backlog"]:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"The {queue.name} queue is full, try again later",
+            headers={"Retry-After": str(settings.admission_backlog_retry_after_s)},
+        )
+
+    allowed, retry_after = take_tokens(
+        redis,
+        f"bulks:admission:{job_type}:{user_id}",
+        rate=limits["rate_per_min"] / 60,
+        capacity=limits["burst"],
+        cost=cost,
+    )
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many {label} requests, try again in {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
@@ -0,0 +1,123 @@
+"""``Idempotency-Key`` handling for workflow submissions.
+
+The first request with a key claims it in Redis and creates the job; its
+response is then stored under the key for ``settings.idempotency_ttl_s``.
+Retries with the same key get the stored response back instead of new
+work. A duplicate that arrives while the first request is still running
+waits for its response, up to ``settings.idempotency_wait_s``. Keys are
+scoped per user and endpoint, and reusing a key with a different request
+body is rejected. Once the job exists, its response is stored right away,
+so a failure in a later step cannot free the key for a second job.
+"""
+
+import asyncio
+import hashlib
+import json
+import uuid
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+from redis import Redis
+
+from src.core.config import settings
+from src.core.supabase import run_blocking
+
+# How long an unfinished claim is honoured if its request dies mid-way
+CLAIM_TTL_S = 60
+POLL_INTERVAL_S = 0.1
+
+# Deletes the key only if it still holds this request's claim
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def fingerprint(body: object) -> str:
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotentRequest:
+    """One request's hold on an idempotency key."""
+
+    def __init__(self, redis: Redis, scope: str, key: str, body: object) -> None:
+        self.redis = redis
+        self.redis_key = f"bulks:idem:{scope}:{key}"
+        self.fingerprint = fingerprint(body)
+        self.claim = json.dumps({"claim": uuid.uuid4().hex, "fingerprint": self.fingerprint})
+        self.completed = False
+
+    async def begin(self) -> Optional[Dict]:
+        """Claim the key, or return the stored response of an earlier request with it."""
+
+        deadline = asyncio.get_running_loop().time() + settings.idempotency_wait_s
+        while True:
+            if self.redis.set(self.redis_key, self.claim, nx=True, ex=CLAIM_TTL_S):
+                return None
+            raw = self.redis.get(self.redis_key)
+            if raw is None:
+                continue  # the other request gave up between our SET and GET
+            stored = json.loads(raw)
+            if stored["fingerprint"] != self.fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key was already used with a different request",
+                )
+            if "response" in stored:
+                return stored["response"]
+            if asyncio.get_running_loop().time() >= deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is still in progress",
+                )
+            await asyncio.sleep(POLL_INTERVAL_S)
+
+    def complete(self, response: Dict) -> None:
+        self.redis.set(
+            self.redis_key,
+            json.dumps({"fingerprint": self.fingerprint, "response": response}),
+            ex=settings.idempotency_ttl_s,
+        )
+        self.completed = True
+
+    def abandon(self) -> None:
+        """Free the key so the request can be retried after a failure."""
+
+        self.redis.eval(_RELEASE, 1, self.redis_key, self.claim)
+
+
+def _no_record(response: Dict) -> None:
+    pass
+
+
+async def run_idempotent(
+    redis: Redis,
+    scope: str,
+    key: Optional[str],
+    body: object,
+    create: Callable[[Callable[[Dict], None]], Dict],
+) -> Dict:
+    """Return ``create(record)``'s response, or the stored one if ``key`` was seen before.
+
+    ``create`` is blocking (it writes the job row to Supabase) and runs in
+    the Supabase thread pool. It calls ``record(response)`` as soon as its
+    job exists; if it fails after that, the key keeps the recorded response
+    instead of being freed for a retry. Without a key, it simply runs.
+    """
+
+    if not key:
+        return await run_blocking(create, _no_record)
+    request = IdempotentRequest(redis, scope, key, body)
+    replay = await request.begin()
+    if replay is not None:
+        return replay
+    try:
+        response = await run_blocking(create, request.complete)
+    except Exception:
+        if not request.completed:
+            request.abandon()
+        raise
+    request.complete(response)
+    return response
@@ -1,6 +1,8 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Literal
 
+from src.core.config import settings
+
 
 class Queries(BaseModel):
     queries: List[str]
@@ -73,6 +75,10 @@ class DefaultPayloadRequest(BaseModel):
         alias="contentFormat"
     )
     generation_amount: int = Field(alias="generationAmount")
+    encoding_profile: Literal["draft", "tiktok", "archive"] = Field(
+        "tiktok", alias="encodingProfile"
+    )
+    image_format: Literal["jpeg", "webp"] = Field("jpeg", alias="imageFormat")
 
 
 class CarouselObject(BaseModel):
@@ -87,8 +93,34 @@ class VideoObject(BaseModel):
     caption: str
     generation: str
     public_generation: str
+    poster: str | None = None
+    preview: str | None = None
 
 
 class JobOutput(BaseModel):
     extra: dict
     content: List[CarouselObject] | List[VideoObject]
+
+
+class BulkPayloadRequest(BaseModel):
+    job_type: Literal["CAROUSEL", "VIDEO"] = Field(alias="jobType")
+    requests: List[DefaultPayloadRequest] = Field(..., min_length=1, max_length=100)
+
+    @property
+    def admission_type(self) -> str:
+        return f"BULK_{self.job_type}"
+
+    @property
+    def total_items(self) -> int:
+        return sum(max(1, item.generation_amount) for item in self.requests)
+
+    @model_validator(mode="after")
+    def _fits_admission_burst(self) -> "BulkPayloadRequest":
+        # Anything larger could never be admitted (see workflow.admission)
+        burst = settings.admission_limits[self.admission_type]["burst"]
+        if self.total_items > burst:
+            raise ValueError(
+                f"{self.total_items} items exceed the bulk limit of {int(burst)}, "
+                "split them across submissions"
+            )
+        return self
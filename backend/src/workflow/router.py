@@ -1,4 +1,7 @@
-from fastapi import APIRouter, Depends, Body, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Body, Header, HTTPException, status
+from redis import Redis
 from rq import Queue, Retry
 
 from .models import (
@@ -6,50 +9,134 @@ from .models import (
     CarouselBusinessRequest,
     PassiveVideoRequest,
     DefaultPayloadRequest,
+    BulkPayloadRequest,
 )
-from src.core.redis import redis_dependency, queue_dependency
+from src.core.config import settings
+from src.core.redis import get_queue, redis_dependency
 from src.core.user import get_user
 
 # from .service import workflow_from_business, process_passive_video, test_workflow
 from .service import process_carousel, process_video
-from src.jobs.utils import sb_get_job, sb_insert_job
+from .admission import admit
+from .idempotency import run_idempotent
+from src.jobs.fairshare import submit, submit_many
+from src.jobs.utils import sb_get_job, sb_insert_job, sb_insert_jobs
 
 router = APIRouter()
 
 
-@router.post("/carousel")
-async def carousel(
-    req: DefaultPayloadRequest,
-    user=Depends(get_user),
-    queue: Queue = Depends(queue_dependency),
+def route_queue(job_type: str, payload: DefaultPayloadRequest) -> str:
+    """Pick the queue for a job so slow encodes cannot starve quick work.
+
+    Single-item and draft jobs are what a user is actively waiting on and go
+    to ``interactive``; large batches go to ``bulk``; everything else goes to
+    its job type's queue.
+    """
+
+    if (
+        payload.generation_amount <= settings.interactive_max_items
+        or payload.encoding_profile == "draft"
+    ):
+        return "interactive"
+    if payload.generation_amount >= settings.bulk_min_items:
+        return "bulk"
+    return "video" if job_type == "VIDEO" else "carousel"
+
+
+def _submit_one(
+    job_type: str, func, req: DefaultPayloadRequest, user, redis: Redis, record
 ):
-    job = queue.enqueue(process_carousel, req.model_dump())
+    queue = get_queue(route_queue(job_type, req), redis)
+    admit(redis, queue, user["sub"], job_type, req.generation_amount)
+    job = submit(queue, user["sub"], func, req.model_dump())
+    response = {"id": job.id, "status": job.get_status()}
+    record(response)
     job_row = {
         "user_id": user["sub"],
         "id": job.id,
-        "status": job.get_status(),
-        "job_type": "CAROUSEL",
+        "status": response["status"],
+        "job_type": job_type,
         "payload": req.model_dump(),
     }
 
     sb_insert_job(job_row)
-    return {"id": job.id, "status": job.get_status()}
+    return response
+
+
+@router.post("/carousel")
+async def carousel(
+    req: DefaultPayloadRequest,
+    user=Depends(get_user),
+    redis: Redis = Depends(redis_dependency),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    return await run_idempotent(
+        redis,
+        f"{user['sub']}:carousel",
+        idempotency_key,
+        req.model_dump(),
+        lambda record: _submit_one("CAROUSEL", process_carousel, req, user, redis, record),
+    )
 
 
 @router.post("/video")
 async def video(
     req: DefaultPayloadRequest,
     user=Depends(get_user),
-    queue: Queue = Depends(queue_dependency),
+    redis: Redis = Depends(redis_dependency),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
-    job = queue.enqueue(process_video, req.model_dump())
-    job_row = {
-        "user_id": user["sub"],
-        "id": job.id,
-        "status": job.get_status(),
-        "job_type": "VIDEO",
-        "payload": req.model_dump(),
-    }
+    return await run_idempotent(
+        redis,
+        f"{user['sub']}:video",
+        idempotency_key,
+        req.model_dump(),
+        lambda record: _submit_one("VIDEO", process_video, req, user, redis, record),
+    )
 
-    sb_insert_job(job_row)
-    return {"id": job.id, "status": job.get_status()}
+
+def _submit_bulk(req: BulkPayloadRequest, user, redis: Redis, record):
+    # A multi-context submission is batch work by definition
+    queue = get_queue("bulk", redis)
+    admit(
+        redis,
+        queue,
+        user["sub"],
+        req.admission_type,
+        req.total_items,
+        jobs=len(req.requests),
+    )
+    func = process_carousel if req.job_type == "CAROUSEL" else process_video
+    payloads = [item.model_dump() for item in req.requests]
+    jobs = submit_many(queue, user["sub"], [(func, (payload,), {}) for payload in payloads])
+    response = {"ids": [job.id for job in jobs]}
+    record(response)
+    sb_insert_jobs(
+        [
+            {
+                "user_id": user["sub"],
+                "id": job.id,
+                "status": job.get_status(refresh=False),
+                "job_type": req.job_type,
+                "payload": payload,
+            }
+            for job, payload in zip(jobs, payloads)
+        ]
+    )
+    return response
+
+
+@router.post("/bulk")
+async def bulk(
+    req: BulkPayloadRequest,
+    user=Depends(get_user),
+    redis: Redis = Depends(redis_dependency),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    return await run_idempotent(
+        redis,
+        f"{user['sub']}:bulk",
+        idempotency_key,
+        req.model_dump(),
+        lambda record: _submit_bulk(req, user, redis, record),
+    )
@@ -1,9 +1,11 @@
 import uuid, os, asyncio
+from functools import lru_cache
 from rq import get_current_job
 from typing import Dict, List, Optional, Union, Literal
 from litellm import acompletion
 import random
 import src.lib.toolkit as toolkit
+from src.lib.scratch import ScratchSpace
 from urllib.parse import urljoin
 
 # from src.content.service import ImageContent
@@ -35,6 +37,9 @@ from src.jobs.utils import sb_update_job
 from src.core.config import settings
 
 OUTPUT_DIR = settings.output_dir
+SCRATCH = ScratchSpace(
+    settings.scratch_dir, settings.scratch_fallback_dir, settings.scratch_max_bytes
+)
 
 
 async def llm_call(model, system_prompt, user_message, basemodel):
@@ -54,15 +59,21 @@ async def llm_call(model, system_prompt, user_message, basemodel):
     return basemodel.model_validate_json(resp.choices[0].message["content"])
 
 
+@lru_cache(maxsize=None)
+def _read_prompt(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
 def get_carousel_prompt(content_style: str = "personal story") -> Dict[str, str]:
     return {
-        "master": open(f"prompts/carousels/{content_style}/master.txt").read(),
+        "master": _read_prompt(f"prompts/carousels/{content_style}/master.txt"),
         # "slide": open(f"prompts/carousels/{content_style}/slide.txt").read(),
     }
 
 
 def get_video_prompt(content_style: Literal["personal story"]) -> str:
-    return open(f"prompts/videos/{content_style}/master.txt").read()
+    return _read_prompt(f"prompts/videos/{content_style}/master.txt")
 
 
 def get_user_message(business_context, generation_amount) -> str:
@@ -94,6 +105,10 @@ def _process_carousel(payload):
     base_dir = os.path.join(OUTPUT_DIR, job.id if job else f"temp_{uuid.uuid1()}")
     os.makedirs(base_dir, exist_ok=True)
 
+    # All slides of all stories are captioned in one batch so backgrounds,
+    # fonts and glyphs are shared across the whole carousel.
+    slides = []
+    image_format = payload.get("image_format", "jpeg")
     for index, story in enumerate(stories.stories):
         carouselObject = {}
         carouselObject["title"] = story.title
@@ -102,22 +117,23 @@ def _process_carousel(payload):
         job_dir = os.path.join(base_dir, str(index))
         os.makedirs(job_dir, exist_ok=True)
         for slide_index, slide in enumerate(story.slides):
-            out_path = os.path.join(job_dir, f"{slide_index:02d}.jpeg")
+            out_path = os.path.join(job_dir, f"{slide_index:02d}.{image_format}")
 
             img_path = get_random_jpg_path(f"scraped-image/{slide.visuals}")
-            toolkit.add_caption_to_image(
-                source=img_path,
-                out_path=out_path,
-                output_size=(1080, 1920),
-                caption=slide.caption,
-                font_path=settings.font_path,
-                background=None,
-            )
+            slides.append((img_path, slide.caption, out_path))
 
             carouselObject["generation"].append(out_path)
 
         carouselObjects.append(carouselObject)
 
+    toolkit.add_captions_to_images(
+        slides,
+        output_size=(1080, 1920),
+        font_path=settings.font_path,
+        background=None,
+        image_format=image_format,
+    )
+
     return {"extra": stories.model_dump(), "content": carouselObjects}
 
 
@@ -126,7 +142,8 @@ def process_carousel(payload):
         job = get_current_job()
         sb_update_job(job.id, status="started", started_at="now()")
 
-        carousel_results = _process_carousel(payload)
+        with SCRATCH.job(job.id):
+            carousel_results = _process_carousel(payload)
 
         sb_update_job(
             job.id,
@@ -163,6 +180,10 @@ def _process_video(payload):
 
     base_dir = os.path.join(OUTPUT_DIR, job.id if job else f"temp_{uuid.uuid1()}")
     os.makedirs(base_dir, exist_ok=True)
+    # Videos drawing the same background clip are captioned in one ffmpeg run,
+    # so the clip is decoded and scaled once for the whole group; poster and
+    # preview renditions come out of that same run.
+    by_source: Dict[str, List[dict]] = {}
     for index, video in enumerate(videos.videos):
         out_path = os.path.join(base_dir, f"video_{index:02d}.mp4")
 
@@ -170,19 +191,27 @@ def _process_video(payload):
         videoObject["title"] = video.title
         videoObject["caption"] = video.caption
         videoObject["generation"] = out_path
+        videoObject["poster"] = os.path.join(base_dir, f"video_{index:02d}_poster.jpg")
+        videoObject["preview"] = os.path.join(base_dir, f"video_{index:02d}_preview.mp4")
+        videoObjects.append(videoObject)
 
         base_video_path = get_random_mp4_path(f"scraped-video/{video.visuals}")
+        by_source.setdefault(base_video_path, []).append(videoObject)
 
-        toolkit.add_caption_to_video(
+    max_duration = settings.video_max_duration or None
+    for base_video_path, group in by_source.items():
+        toolkit.add_captions_to_video(
             source=base_video_path,
-            out_path=out_path,
+            captions=[(item["caption"], item["generation"]) for item in group],
+            poster_paths=[item["poster"] for item in group],
+            preview_paths=[item["preview"] for item in group],
             output_size=(1080, 1920),
-            caption=video.caption,
             font_path=settings.font_path,
             background=None,
-            crf=25,
+            profile=payload.get("encoding_profile", "tiktok"),
+            max_duration=max_duration,
+            start_offset="random" if max_duration else None,
         )
-        videoObjects.append(videoObject)
 
     return {"extra": videos.model_dump(), "content": videoObjects}
 
@@ -192,7 +221,8 @@ def process_video(payload):
         job = get_current_job()
         sb_update_job(job.id, status="started", started_at="now()")
 
-        video_results = _process_video(payload)
+        with SCRATCH.job(job.id):
+            video_results = _process_video(payload)
 
         sb_update_job(
             job.id,
@@ -21,11 +21,26 @@ def wrap_sentence(text: str, width: int = 35) -> str:
     return "\n".join(out)
 
 
+# Directory listings of the media library, keyed by (directory, suffix) and
+# invalidated when the directory's mtime changes (files added or removed).
+_MEDIA_INDEX: dict = {}
+
+
+def list_media(full_path: str, suffix: str) -> List[str]:
+    """Return the file names in ``full_path`` ending in ``suffix`` (cached)."""
+    mtime = os.stat(full_path).st_mtime_ns
+    cached = _MEDIA_INDEX.get((full_path, suffix))
+    if cached is None or cached[0] != mtime:
+        names = [f for f in os.listdir(full_path) if f.lower().endswith(suffix)]
+        cached = _MEDIA_INDEX[(full_path, suffix)] = (mtime, names)
+    return cached[1]
+
+
 def get_random_jpg_path(relative_dir: str) -> str:
     """Return absolute path to a random .jpg file inside a given relative directory."""
     base_path = os.path.abspath(os.getcwd())
     full_path = os.path.join(base_path, relative_dir)
-    jpgs = [f for f in os.listdir(full_path) if f.lower().endswith(".jpg")]
+    jpgs = list_media(full_path, ".jpg")
     if not jpgs:
         raise FileNotFoundError("No .jpg files found.")
     return os.path.join(full_path, random.choice(jpgs))
@@ -35,7 +50,7 @@ def get_random_mp4_path(relative_dir: str) -> str:
     """Return absolute path to a random .mp4 file inside a given relative directory."""
     base_path = os.path.abspath(os.getcwd())
     full_path = os.path.join(base_path, relative_dir)
-    mp4s = [f for f in os.listdir(full_path) if f.lower().endswith(".mp4")]
+    mp4s = list_media(full_path, ".mp4")
     if not mp4s:
         raise FileNotFoundError("No .mp4 files found.")
     # return os.path.join(full_path, random.choice(mp4s))